@@ -0,0 +1,302 @@
+"""
+三坐标报告批量生成 - 命令行模式
+
+把一个目录（或清单文件）中的截图和坐标文件批量转换为Excel报告：
+截图走OCR（线程池，限制并发以控制接口QPS），坐标文件和三坐标测量机导出文件
+（PC-DMIS/Calypso/DMIS/XYZ，见 cmm_import.py）直接解析，
+工作簿生成放在进程池中并行执行，绕开GIL。
+
+目录模式按文件名分组，文件名中包含工作表关键字：
+    P25-488-前门扶手-前模仁.png    -> 报告 "P25-488-前门扶手" 的前模仁
+    P25-488-前门扶手-后模仁.txt    -> 报告 "P25-488-前门扶手" 的后模仁
+    关键字: 前模仁/front/cav -> 前模仁, 后模仁/back/cor -> 后模仁（不含关键字时视为前模仁）
+    关键字须是用 - _ 或空格分隔的完整片段（Cavity、record 等不算），优先匹配中文关键字
+同一工作表同时有截图和坐标文件时，坐标取自坐标文件（不调用OCR），截图仍插入报告。
+
+清单模式（JSON）：
+    [{"name": "P25-488-前门扶手", "tolerance": 0.03,
+      "sheets": [{"sheet_name": "前模仁", "image": "a.png", "coordinates": "a.txt"}]}]
+    相对路径相对于清单文件所在目录。
+
+运行方法：
+    python batch.py 输入目录或清单.json -o 输出目录 [--jobs 8] [--ocr-concurrency 4] [--force]
+
+已存在的报告会被跳过，中断后重新运行即可从断点继续；--force 强制全部重新生成。
+"""
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+import cmm_import
+import web_app
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+COORDINATE_EXTENSIONS = ('.txt', '.csv', '.dmo', '.xyz', '.asc')
+
+
+def _keyword(pattern):
+    """只匹配以分隔符（- _ 空格）或首尾为界的完整片段"""
+    return re.compile(r'(?:^|(?<=[-_\s]))(?:' + pattern + r')(?=$|[-_\s])', re.IGNORECASE)
+
+
+SHEET_KEYWORDS = (
+    (_keyword('前模仁'), '前模仁'),
+    (_keyword('后模仁'), '后模仁'),
+    (_keyword('front|cav'), '前模仁'),
+    (_keyword('back|cor'), '后模仁'),
+)
+
+IMAGE_MIME = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.bmp': 'image/bmp'}
+
+
+# ========== 任务收集 ==========
+
+def _split_sheet(stem):
+    """从文件名中识别工作表，返回 (报告名, 工作表名)"""
+    for pattern, sheet_name in SHEET_KEYWORDS:
+        match = None
+        for match in pattern.finditer(stem):
+            pass
+        if match:
+            left = stem[:match.start()].rstrip(' -_')
+            right = stem[match.end():].lstrip(' -_')
+            name = f"{left}-{right}" if left and right else left or right
+            return name or stem, sheet_name
+    return stem, '前模仁'
+
+
+def collect_directory(input_dir):
+    """按文件名把目录中的输入文件分组为报告"""
+    reports = {}
+    for entry in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, entry)
+        stem, ext = os.path.splitext(entry)
+        ext = ext.lower()
+        if not os.path.isfile(path) or ext not in IMAGE_EXTENSIONS + COORDINATE_EXTENSIONS:
+            continue
+
+        name, sheet_name = _split_sheet(stem)
+        report = reports.setdefault(name, {'name': name, 'sheets': {}})
+        sheet = report['sheets'].setdefault(sheet_name, {'sheet_name': sheet_name})
+        sheet['image' if ext in IMAGE_EXTENSIONS else 'coordinates'] = path
+
+    return [dict(r, sheets=list(r['sheets'].values())) for r in reports.values()]
+
+
+def collect_manifest(manifest_path):
+    """读取JSON清单"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    reports = []
+    for item in manifest:
+        sheets = []
+        for sheet in item.get('sheets', []):
+            sheet = dict(sheet)
+            for key in ('image', 'coordinates'):
+                if sheet.get(key):
+                    sheet[key] = os.path.join(base_dir, sheet[key])
+            sheets.append(sheet)
+        reports.append(dict(item, sheets=sheets))
+    return reports
+
+
+# ========== OCR / 解析（线程池） ==========
+
+def prepare_sheet(sheet):
+    """读取单个工作表的输入，返回 (sheets_data项, OCR耗时, 错误)"""
+    start = time.perf_counter()
+    item = {'sheet_name': sheet['sheet_name']}
+
+    image_bytes = None
+    if sheet.get('image'):
+        with open(sheet['image'], 'rb') as f:
+            image_bytes = f.read()
+        mime = IMAGE_MIME.get(os.path.splitext(sheet['image'])[1].lower(), 'image/png')
+        item['image_data'] = f"data:{mime};base64,{base64.b64encode(image_bytes).decode('ascii')}"
+
+    if sheet.get('coordinates'):
+        imported = cmm_import.import_cmm_file(sheet['coordinates'], line_parser=web_app.parse_single_line)
+        item['points'] = imported['points']
+        if imported['full_data']:
+            item['full_data'] = imported['full_data']
+    elif image_bytes is not None:
+        ocr_text, error, _ = web_app.ocr_from_image(image_bytes, os.path.basename(sheet['image']))
+        if error or not ocr_text:
+            return None, time.perf_counter() - start, f"{sheet['sheet_name']} OCR失败: {error or '未能识别到文字'}"
+        item['points'] = web_app.parse_ocr_text(ocr_text)
+    else:
+        return None, 0.0, f"{sheet['sheet_name']} 没有输入文件"
+
+    if not item['points']:
+        return None, time.perf_counter() - start, f"{sheet['sheet_name']} 未解析到坐标"
+    return item, time.perf_counter() - start, None
+
+
+def prepare_report(report, tolerance):
+    """OCR/解析一个报告的全部工作表"""
+    sheets_data = []
+    ocr_seconds = 0.0
+    for sheet in report['sheets']:
+        item, seconds, error = prepare_sheet(sheet)
+        ocr_seconds += seconds
+        if error:
+            return None, ocr_seconds, error
+        item['tolerance'] = report.get('tolerance', tolerance)
+        sheets_data.append(item)
+    return sheets_data, ocr_seconds, None
+
+
+# ========== 工作簿生成（进程池） ==========
+
+def _init_worker():
+    """工作进程初始化：预先导入openpyxl并读入模板"""
+    web_app._load_openpyxl()
+    web_app.get_template_bytes()
+
+
+def generate_report(name, sheets_data, output_path, tolerance):
+    """在工作进程中生成报告，先写临时文件再重命名，保证中断时不留下半个文件"""
+    start = time.perf_counter()
+    buffer, error = web_app.generate_excel_from_template(
+        [], None, tolerance, None, sheets_data, name + '.xlsx')
+    if error:
+        return time.perf_counter() - start, error
+
+    tmp_path = output_path + '.part'
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getbuffer())
+    os.replace(tmp_path, output_path)
+    return time.perf_counter() - start, None
+
+
+# ========== 主流程 ==========
+
+def run(reports, output_dir, jobs, ocr_concurrency, tolerance, force=False):
+    """执行批处理，返回每个报告的结果列表"""
+    os.makedirs(output_dir, exist_ok=True)
+    total = len(reports)
+    results = []
+    pending = []
+
+    for report in reports:
+        output_path = os.path.join(output_dir, report['name'] + '.xlsx')
+        if not force and os.path.exists(output_path):
+            results.append({'name': report['name'], 'status': 'skipped', 'output': output_path})
+        else:
+            pending.append((report, output_path))
+
+    done = len(results)
+    if done:
+        print(f"跳过已完成的报告 {done} 个")
+
+    def progress(result):
+        nonlocal done
+        done += 1
+        results.append(result)
+        if result['status'] == 'ok':
+            print(f"[{done}/{total}] {result['name']}  OCR {result['ocr_seconds']:.2f}s  生成 {result['generate_seconds']:.2f}s")
+        else:
+            print(f"[{done}/{total}] {result['name']}  失败: {result['error']}")
+
+    # OCR 完成一个就提交一个到进程池，两个阶段流水线执行
+    # 工作进程用 spawn 启动：fork 会复制OCR线程此刻持有的锁，子进程可能因此死锁
+    with ThreadPoolExecutor(max_workers=ocr_concurrency) as ocr_pool, \
+            ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                mp_context=multiprocessing.get_context('spawn')) as gen_pool:
+        ocr_futures = {
+            ocr_pool.submit(prepare_report, report, tolerance): (report, output_path)
+            for report, output_path in pending
+        }
+        gen_futures = {}
+        for future in as_completed(ocr_futures):
+            report, output_path = ocr_futures[future]
+            try:
+                sheets_data, ocr_seconds, error = future.result()
+            except Exception as e:
+                sheets_data, ocr_seconds, error = None, 0.0, str(e)
+            if error:
+                progress({'name': report['name'], 'status': 'failed', 'error': error, 'ocr_seconds': ocr_seconds})
+                continue
+            gen_future = gen_pool.submit(
+                generate_report, report['name'], sheets_data, output_path, report.get('tolerance', tolerance))
+            gen_futures[gen_future] = (report, output_path, ocr_seconds)
+
+        for future in as_completed(gen_futures):
+            report, output_path, ocr_seconds = gen_futures[future]
+            try:
+                generate_seconds, error = future.result()
+            except Exception as e:
+                generate_seconds, error = 0.0, str(e)
+            result = {'name': report['name'], 'ocr_seconds': ocr_seconds, 'generate_seconds': generate_seconds}
+            if error:
+                result.update(status='failed', error=error)
+            else:
+                result.update(status='ok', output=output_path)
+            progress(result)
+
+    return results
+
+
+def print_summary(results, elapsed):
+    ok = [r for r in results if r['status'] == 'ok']
+    failed = [r for r in results if r['status'] == 'failed']
+    skipped = [r for r in results if r['status'] == 'skipped']
+
+    print("\n" + "=" * 60)
+    print(f"完成 {len(ok)}，失败 {len(failed)}，跳过 {len(skipped)}，总耗时 {elapsed:.2f}s")
+    if ok:
+        ocr_total = sum(r['ocr_seconds'] for r in ok)
+        gen_total = sum(r['generate_seconds'] for r in ok)
+        slowest = max(ok, key=lambda r: r['ocr_seconds'] + r['generate_seconds'])
+        print(f"OCR/解析累计 {ocr_total:.2f}s，平均 {ocr_total / len(ok):.2f}s/个")
+        print(f"生成累计 {gen_total:.2f}s，平均 {gen_total / len(ok):.2f}s/个")
+        print(f"最慢: {slowest['name']}（OCR {slowest['ocr_seconds']:.2f}s，生成 {slowest['generate_seconds']:.2f}s）")
+    for r in failed:
+        print(f"失败: {r['name']} - {r['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='三坐标报告批量生成')
+    parser.add_argument('input', help='输入目录或JSON清单文件')
+    parser.add_argument('-o', '--output', required=True, help='输出目录')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='生成工作簿的进程数')
+    parser.add_argument('--ocr-concurrency', type=int, default=4, help='同时进行的OCR请求数')
+    parser.add_argument('--tolerance', type=float, default=0.03, help='公差')
+    parser.add_argument('--force', action='store_true', help='重新生成已存在的报告')
+    args = parser.parse_args(argv)
+
+    if not web_app.HAS_OPENPYXL:
+        print("openpyxl未安装，无法生成Excel")
+        return 1
+
+    if os.path.isdir(args.input):
+        reports = collect_directory(args.input)
+    else:
+        reports = collect_manifest(args.input)
+
+    if not reports:
+        print("没有找到输入文件")
+        return 1
+
+    start = time.perf_counter()
+    results = run(reports, args.output, args.jobs, args.ocr_concurrency, args.tolerance, args.force)
+    elapsed = time.perf_counter() - start
+    print_summary(results, elapsed)
+
+    with open(os.path.join(args.output, 'batch_summary.json'), 'w', encoding='utf-8') as f:
+        json.dump({'elapsed_seconds': elapsed, 'results': results}, f, ensure_ascii=False, indent=2)
+
+    return 1 if any(r['status'] == 'failed' for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
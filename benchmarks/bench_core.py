@@ -0,0 +1,237 @@
+"""
+核心函数微基准：坐标解析、OCR版面重组、CSV格式化和Excel生成
+
+基于 benchmarks/fixtures 下录制的样本数据（百度 words_result、OCR.space 文本、
+粘贴的坐标导出、多表 sheets_data 请求），按需放大到不同规模后测量耗时和峰值内存。
+
+运行方法：
+    python benchmarks/bench_core.py                   # 运行并与基线比较
+    python benchmarks/bench_core.py --save-baseline   # 运行并保存为新基线
+    python benchmarks/bench_core.py -k parse --quick  # 只运行名称含 parse 的小规模用例
+
+与基线相比耗时或峰值内存增长超过阈值（默认25%）时，以退出码1结束。
+基线与机器相关，更换机器后请先重新保存基线。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, 'benchmarks', 'fixtures')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baselines.json')
+
+sys.path.insert(0, ROOT)
+import web_app  # noqa: E402
+import payload_schema  # noqa: E402
+from json_codec import codec  # noqa: E402
+
+
+# ========== 样本数据 ==========
+
+def load_fixture(name):
+    path = os.path.join(FIXTURES_DIR, name)
+    if name.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    with open(path, encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def scale_lines(text, count):
+    """循环使用样本行，生成指定行数的文本"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    return '\n'.join(lines[i % len(lines)] for i in range(count))
+
+
+def scale_words_result(words, times):
+    """纵向复制百度 words_result，每份整体下移，模拟多页/长截图"""
+    height = max(w['location']['top'] + w['location']['height'] for w in words) + 20
+    result = []
+    for n in range(times):
+        for w in words:
+            location = dict(w['location'], top=w['location']['top'] + n * height)
+            result.append({'words': w['words'], 'location': location})
+    return result
+
+
+def make_points(count):
+    points = web_app.parse_coordinates_text(scale_lines(load_fixture('coordinates.txt'), count))
+    return [dict(p, id=i + 1) for i, p in enumerate(points)]
+
+
+def make_excel_payload(count):
+    """生成含 count 个测量点完整数据的 /generate_excel 请求体（JSON字节）"""
+    points = make_points(count)
+    full_data = [{'pointId': p['id'], 'pointName': f"no.{p['id']}", 'axis': axis, 'tolMin': -0.03, 'tolMax': 0.03,
+                  'nominal': p[axis.lower()], 'measured': p[axis.lower()] + 0.01, 'deviation': 0.01, 'status': 'OK'}
+                 for p in points for axis in ('X', 'Y', 'Z')]
+    payload = {'filename': 'P25-488-压测', 'tolerance': 0.03,
+               'sheets_data': [{'sheet_name': '前模仁', 'points': points, 'full_data': full_data}]}
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def load_template():
+    web_app._load_openpyxl()
+    return web_app.template_registry.get().load_workbook()
+
+
+# ========== 用例定义 ==========
+# 每个用例: (名称, setup, fn)。setup 返回 fn 的参数，不计入耗时
+
+def build_cases(quick=False):
+    cases = []
+    coord_text = load_fixture('coordinates.txt')
+    coord_lines = [line for line in coord_text.splitlines() if line.strip()]
+    words = load_fixture('baidu_words_result.json')['words_result']
+    ocr_space_text = load_fixture('ocr_space.txt')
+    sheets_data = load_fixture('sheets_data.json')
+
+    def lines_loop(lines):
+        for i, line in enumerate(lines):
+            web_app.parse_single_line(line, i + 1)
+
+    cases.append(('parse_single_line[1000]', lambda: ((coord_lines * 50)[:1000],), lines_loop))
+
+    sizes = (10, 1000) if quick else (10, 1000, 100000)
+    for n in sizes:
+        text = scale_lines(coord_text, n)
+        cases.append((f'parse_coordinates_text[{n}]', lambda text=text: (text,), web_app.parse_coordinates_text))
+
+    for times in ((1, 10) if quick else (1, 10, 100)):
+        scaled = scale_words_result(words, times)
+        cases.append((f'process_spatial_ocr[{len(scaled)}]', lambda scaled=scaled: (scaled,), web_app.process_spatial_ocr))
+        cases.append((f'parse_ocr_text.baidu[{len(scaled)}]', lambda scaled=scaled: (scaled,), web_app.parse_ocr_text))
+
+    for times in ((1, 10) if quick else (1, 10, 100)):
+        text = '\n'.join([ocr_space_text] * times)
+        cases.append((f'parse_ocr_text.ocr_space[{times}x]', lambda text=text: (text,), web_app.parse_ocr_text))
+
+    for n in ((10, 1000) if quick else (10, 1000, 10000)):
+        measurements = web_app.generate_measurement_data(make_points(n))
+        cases.append((f'format_csv[{n}]', lambda m=measurements: (m,), web_app.format_csv))
+
+    def update_all(wb, items):
+        layouts = web_app.template_registry.get().layouts
+        for item in items:
+            err = web_app.update_sheet_data(
+                wb, item['sheet_name'], item['points'], item.get('tolerance', 0.03),
+                item.get('image_data'), sheets_data.get('filename'), item.get('full_data'),
+                layouts.get(item['sheet_name']))
+            if err:
+                raise RuntimeError(err)
+
+    cases.append(('update_sheet_data[sheets_data]', lambda: (load_template(), sheets_data['sheets_data']), update_all))
+
+    large = [{'sheet_name': '前模仁', 'points': make_points(100)}]
+    cases.append(('update_sheet_data[100]', lambda: (load_template(), large), update_all))
+
+    def generate(payload):
+        buffer, err = web_app.generate_excel_from_template(
+            [], None, payload.get('tolerance', 0.03), None, payload['sheets_data'], payload.get('filename'))
+        if err:
+            raise RuntimeError(err)
+
+    cases.append(('generate_excel_from_template[sheets_data]', lambda: (sheets_data,), generate))
+
+    # 请求体解码 + 转换为测量数据：标准库逐项转换 vs 编解码器 + 编译后的模式
+    def decode_stdlib(body):
+        for item in json.loads(body)['sheets_data']:
+            web_app.build_measurement_data(item['points'], item.get('tolerance', 0.03), item.get('full_data'))
+
+    def decode_codec(body):
+        for item in payload_schema.GENERATE_EXCEL.validate(codec.loads(body))['sheets_data']:
+            web_app.build_measurement_data(item['points'], item.get('tolerance', 0.03), item.get('full_data'))
+
+    for n in ((100, 1000) if quick else (100, 10000)):
+        body = make_excel_payload(n)
+        cases.append((f'payload_decode.stdlib[{n}]', lambda body=body: (body,), decode_stdlib))
+        cases.append((f'payload_decode.{codec.name}[{n}]', lambda body=body: (body,), decode_codec))
+    return cases
+
+
+# ========== 运行与比较 ==========
+
+def run_case(setup, fn, repeat):
+    """返回 (耗时中位数, 最小耗时, 峰值内存字节)"""
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    # 峰值内存单独测一次，tracemalloc 会明显拖慢执行，不能与计时混在一起
+    args = setup()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), min(times), peak
+
+
+def compare(results, baseline, threshold, min_delta):
+    """返回超过阈值的回归列表（按最小耗时比较，受系统抖动影响最小）"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['min'] - base['min'] > min_delta and result['min'] > base['min'] * (1 + threshold):
+            regressions.append(f"{name}: 耗时 {base['min'] * 1000:.2f}ms -> {result['min'] * 1000:.2f}ms")
+        if result['peak_bytes'] > base['peak_bytes'] * (1 + threshold) and result['peak_bytes'] - base['peak_bytes'] > 64 * 1024:
+            regressions.append(f"{name}: 峰值内存 {base['peak_bytes'] / 1024:.0f}KB -> {result['peak_bytes'] / 1024:.0f}KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='核心函数微基准')
+    parser.add_argument('-k', dest='filter', default='', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--repeat', type=int, default=5, help='每个用例的计时次数')
+    parser.add_argument('--quick', action='store_true', help='跳过大规模用例')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果写入基线文件')
+    parser.add_argument('--threshold', type=float, default=0.25, help='允许的相对回归比例')
+    parser.add_argument('--min-delta', type=float, default=0.0005, help='忽略小于该秒数的耗时差异')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'用例':<44}{'中位数(ms)':>12}{'最小(ms)':>12}{'峰值内存(KB)':>14}{'基线最小(ms)':>14}")
+    for name, setup, fn in build_cases(args.quick):
+        if args.filter not in name:
+            continue
+        median, best, peak = run_case(setup, fn, args.repeat)
+        results[name] = {'median': median, 'min': best, 'peak_bytes': peak}
+        base = baseline.get(name)
+        base_str = f"{base['min'] * 1000:.2f}" if base else '-'
+        print(f"{name:<44}{median * 1000:>12.2f}{best * 1000:>12.2f}{peak / 1024:>14.0f}{base_str:>14}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"\n基线已保存: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    if regressions:
+        print(f"\n性能回归（阈值 {args.threshold:.0%}）:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
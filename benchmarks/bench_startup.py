@@ -0,0 +1,78 @@
+"""
+启动性能基准：测量 web_app 的导入耗时、预热耗时和首个请求延迟
+
+运行方法：
+    python benchmarks/bench_startup.py [--runs 5] [--no-warmup]
+
+每次测量都在新的子进程中进行，保证是真正的冷启动。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行的测量脚本，结果以JSON输出到最后一行
+_CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import web_app
+t1 = time.perf_counter()
+warmup = None
+if {warmup}:
+    web_app.warm_up()
+    warmup = time.perf_counter() - t1
+# 不调用外部OCR，首个请求选取 /generate（解析）和 /generate_excel（模板生成）
+client = web_app.app.test_client()
+t2 = time.perf_counter()
+r1 = client.post('/generate', json={{'coordinates': '1, 1.0, 2.0, 3.0'}})
+t3 = time.perf_counter()
+r2 = client.post('/generate_excel', json={{'points': [{{'id': 1, 'x': 1.0, 'y': 2.0, 'z': 3.0}}]}})
+t4 = time.perf_counter()
+print(json.dumps({{
+    'import': t1 - t0,
+    'warmup': warmup,
+    'first_generate': t3 - t2,
+    'first_generate_excel': t4 - t3,
+    'status': [r1.status_code, r2.status_code],
+}}))
+'''
+
+
+def run_once(warmup):
+    env = dict(os.environ)
+    # 避免预热时访问真实的百度接口
+    env.setdefault('BAIDU_API_KEY', '')
+    output = subprocess.run(
+        [sys.executable, '-c', _CHILD.format(warmup=warmup)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='web_app 冷启动基准')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数')
+    parser.add_argument('--no-warmup', action='store_true', help='不调用 warm_up()，测量未预热的首请求')
+    args = parser.parse_args()
+
+    results = [run_once(not args.no_warmup) for _ in range(args.runs)]
+
+    print(f"{'阶段':<24}{'中位数(ms)':>12}{'最小(ms)':>12}{'最大(ms)':>12}")
+    for key in ('import', 'warmup', 'first_generate', 'first_generate_excel'):
+        values = [r[key] * 1000 for r in results if r[key] is not None]
+        if not values:
+            continue
+        print(f"{key:<24}{statistics.median(values):>12.1f}{min(values):>12.1f}{max(values):>12.1f}")
+
+    statuses = {tuple(r['status']) for r in results}
+    if statuses != {(200, 200)}:
+        print(f"警告: 请求返回状态异常 {statuses}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+端到端压测：本地OCR替身服务 + 应用子进程 + 按目标速率发送混合流量
+
+默认会启动百度和OCR.space替身服务（见 ocr_standins.py），再以指向替身的环境变量
+在子进程中启动 web_app，然后按固定速率（开环）发送 /upload、/generate、/generate_excel
+混合请求，最后按接口输出 p50/p95/p99 延迟、吞吐量和错误率。
+
+运行方法：
+    python benchmarks/load_test.py --rate 20 --duration 30
+    python benchmarks/load_test.py --mix upload=1,generate_excel=1 --baidu-error-rate 0.2
+    python benchmarks/load_test.py --target http://127.0.0.1:5000   # 压测已启动的实例
+    python benchmarks/load_test.py --mix generate_excel=1 --excel-workers 4   # Excel在进程池中生成
+    python benchmarks/load_test.py --baidu-qps 2   # 按生产环境的百度QPS配额限流（默认不限流）
+
+延迟从计划发送时刻开始计算，因此客户端排队造成的延迟也会计入（避免协调遗漏）。
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import ocr_standins
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = ocr_standins.FIXTURES_DIR
+
+# 上传用的图片内容：替身服务不解析图片，用一个最小PNG即可
+_PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+
+
+# ========== 请求构造 ==========
+
+def _multipart(field, filename, content, mime='image/png'):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: {mime}\r\n\r\n'
+    ).encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def build_requests():
+    """返回 {接口名: (路径, 请求体, Content-Type)}"""
+    with open(os.path.join(FIXTURES_DIR, 'coordinates.txt'), encoding='utf-8') as f:
+        coordinates = f.read()
+    with open(os.path.join(FIXTURES_DIR, 'sheets_data.json'), encoding='utf-8') as f:
+        sheets_payload = json.load(f)
+
+    upload_body, upload_type = _multipart('image', 'screenshot.png', _PNG_BYTES)
+    generate_body = json.dumps({'coordinates': coordinates, 'tolerance': 0.03}).encode('utf-8')
+    excel_body = json.dumps(sheets_payload, ensure_ascii=False).encode('utf-8')
+
+    return {
+        'upload': ('/upload', upload_body, upload_type),
+        'generate': ('/generate', generate_body, 'application/json'),
+        'generate_excel': ('/generate_excel', excel_body, 'application/json'),
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# ========== 应用进程 ==========
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(env_overrides, timeout=60):
+    """在子进程中启动 web_app（多线程开发服务器），等待 /ready 就绪后返回 (进程, 地址)"""
+    port = _free_port()
+    env = dict(os.environ, **env_overrides)
+    code = (
+        "import web_app; web_app.warm_up(); "
+        f"web_app.app.run(host='127.0.0.1', port={port}, threaded=True)"
+    )
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('应用进程启动失败')
+        try:
+            with urllib.request.urlopen(base_url + '/ready', timeout=2) as response:
+                if response.status == 200:
+                    return proc, base_url
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.2)
+
+    proc.terminate()
+    raise RuntimeError('等待应用就绪超时')
+
+
+# ========== 压测 ==========
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, latency, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(latency)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def _send(base_url, name, spec, scheduled, recorder, timeout):
+    path, body, content_type = spec
+    req = urllib.request.Request(base_url + path, data=body, method='POST')
+    req.add_header('Content-Type', content_type)
+    ok = False
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            ok = response.status == 200
+    except urllib.error.HTTPError as e:
+        e.read()
+    except Exception:
+        pass
+    recorder.record(name, time.perf_counter() - scheduled, ok)
+
+
+def run_load(base_url, mix, rate, duration, workers, timeout):
+    requests = build_requests()
+    unknown = set(mix) - set(requests)
+    if unknown:
+        raise ValueError(f"未知接口: {', '.join(sorted(unknown))}")
+    names = list(mix)
+    weights = [mix[n] for n in names]
+
+    recorder = Recorder()
+    total = int(rate * duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = random.choices(names, weights)[0]
+            pool.submit(_send, base_url, name, requests[name], scheduled, recorder, timeout)
+    elapsed = time.perf_counter() - start
+    return recorder, elapsed
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def report(recorder, elapsed):
+    print(f"\n{'接口':<18}{'请求数':>8}{'吞吐(req/s)':>14}{'错误率':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    names = sorted(recorder.latencies)
+    all_latencies = []
+    all_errors = 0
+    for name in names + ['总计']:
+        if name == '总计':
+            values, errors = sorted(all_latencies), all_errors
+        else:
+            values, errors = sorted(recorder.latencies[name]), recorder.errors.get(name, 0)
+            all_latencies.extend(values)
+            all_errors += errors
+        count = len(values)
+        print(f"{name:<18}{count:>8}{count / elapsed:>14.2f}{(errors / count if count else 0):>10.1%}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}{percentile(values, 99) * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端压测')
+    parser.add_argument('--target', help='压测已启动的实例（不启动替身服务和应用进程）')
+    parser.add_argument('--rate', type=float, default=10.0, help='目标速率（请求/秒）')
+    parser.add_argument('--duration', type=float, default=20.0, help='持续时间（秒）')
+    parser.add_argument('--mix', default='upload=3,generate=5,generate_excel=2', help='接口权重')
+    parser.add_argument('--workers', type=int, default=64, help='最大并发连接数')
+    parser.add_argument('--timeout', type=float, default=60.0, help='单个请求超时（秒）')
+    parser.add_argument('--baidu-latency', type=float, default=0.3)
+    parser.add_argument('--baidu-jitter', type=float, default=0.05)
+    parser.add_argument('--baidu-error-rate', type=float, default=0.0)
+    parser.add_argument('--baidu-qps', type=float, default=0.0,
+                        help='应用对百度OCR的QPS限制（0 为不限流；应用默认值2会限制默认流量中约3次/秒的上传）')
+    parser.add_argument('--ocr-space-latency', type=float, default=0.8)
+    parser.add_argument('--ocr-space-jitter', type=float, default=0.1)
+    parser.add_argument('--ocr-space-error-rate', type=float, default=0.0)
+    parser.add_argument('--excel-workers', type=int, default=0, help='Excel生成进程数（0 为在请求线程中生成）')
+    parser.add_argument('--excel-max-pending', type=int, default=0, help='进程池执行和排队任务上限（0 为进程数的2倍）')
+    args = parser.parse_args()
+
+    proc = None
+    baidu_config = ocr_space_config = None
+    if args.target:
+        base_url = args.target.rstrip('/')
+    else:
+        baidu_config = ocr_standins.StandinConfig(args.baidu_latency, args.baidu_jitter, args.baidu_error_rate)
+        ocr_space_config = ocr_standins.StandinConfig(args.ocr_space_latency, args.ocr_space_jitter, args.ocr_space_error_rate)
+        _, baidu_url = ocr_standins.start_baidu(baidu_config)
+        _, ocr_space_url = ocr_standins.start_ocr_space(ocr_space_config)
+        proc, base_url = start_app({
+            'BAIDU_API_BASE': baidu_url,
+            'OCR_SPACE_API_URL': ocr_space_url + '/parse/image',
+            'XYZEXCEL_EXCEL_WORKERS': str(args.excel_workers),
+            'XYZEXCEL_EXCEL_MAX_PENDING': str(args.excel_max_pending),
+            'XYZEXCEL_OCR_BAIDU_QPS': str(args.baidu_qps),
+        })
+
+    try:
+        print(f"压测 {base_url}：{args.rate} req/s，{args.duration}s，流量比例 {args.mix}")
+        recorder, elapsed = run_load(base_url, parse_mix(args.mix), args.rate, args.duration, args.workers, args.timeout)
+        report(recorder, elapsed)
+        if baidu_config:
+            print(f"\n替身服务：百度 {baidu_config.requests} 次（错误 {baidu_config.errors}），"
+                  f"OCR.space {ocr_space_config.requests} 次（错误 {ocr_space_config.errors}）")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+百度OCR / OCR.space 本地替身服务 - 回放录制的响应，用于压测而不消耗真实配额
+
+替身实现的接口：
+    百度     POST /oauth/2.0/token               返回固定 access_token
+             POST /rest/2.0/ocr/v1/accurate      回放 fixtures/baidu_words_result.json
+    OCR.space POST /parse/image                  回放 fixtures/ocr_space.txt
+
+可配置每个服务的延迟（均值 + 抖动）和错误率。错误响应与真实服务一致：
+百度返回 error_code 18（QPS超限），OCR.space 返回 IsErroredOnProcessing。
+
+单独运行：
+    python benchmarks/ocr_standins.py --baidu-port 8801 --ocr-space-port 8802 --latency 0.3 --error-rate 0.05
+
+然后以环境变量启动应用：
+    BAIDU_API_BASE=http://127.0.0.1:8801 OCR_SPACE_API_URL=http://127.0.0.1:8802/parse/image python web_app.py
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+class StandinConfig:
+    """替身服务行为配置，运行中可修改"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+    def should_fail(self):
+        fail = random.random() < self.error_rate
+        with self._lock:
+            self.requests += 1
+            if fail:
+                self.errors += 1
+        return fail
+
+
+class _StandinHandler(BaseHTTPRequestHandler):
+    config = None
+    routes = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+
+        handler = self.routes.get(self.path.split('?', 1)[0])
+        if handler is None:
+            self.send_error(404)
+            return
+
+        self.config.delay()
+        status, body = handler(self.config.should_fail())
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _baidu_routes():
+    with open(os.path.join(FIXTURES_DIR, 'baidu_words_result.json'), encoding='utf-8') as f:
+        recorded = json.load(f)
+
+    def token(fail):
+        if fail:
+            return 401, {'error': 'invalid_client', 'error_description': 'unknown client id'}
+        return 200, {'access_token': '24.standin-token', 'expires_in': 2592000}
+
+    def accurate(fail):
+        if fail:
+            return 200, {'error_code': 18, 'error_msg': 'Open api qps request limit reached'}
+        return 200, recorded
+
+    return {'/oauth/2.0/token': token, '/rest/2.0/ocr/v1/accurate': accurate}
+
+
+def _ocr_space_routes():
+    with open(os.path.join(FIXTURES_DIR, 'ocr_space.txt'), encoding='utf-8', newline='') as f:
+        text = f.read()
+
+    def parse(fail):
+        if fail:
+            return 200, {'IsErroredOnProcessing': True, 'ErrorMessage': ['Server busy, please retry']}
+        return 200, {
+            'IsErroredOnProcessing': False,
+            'ParsedResults': [{'ParsedText': text, 'FileParseExitCode': 1}],
+        }
+
+    return {'/parse/image': parse}
+
+
+def start_server(routes, config, host='127.0.0.1', port=0):
+    """在后台线程启动替身服务，返回 (server, base_url)"""
+    handler = type('StandinHandler', (_StandinHandler,), {'config': config, 'routes': routes})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='ocr-standin', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def start_baidu(config, host='127.0.0.1', port=0):
+    return start_server(_baidu_routes(), config, host, port)
+
+
+def start_ocr_space(config, host='127.0.0.1', port=0):
+    return start_server(_ocr_space_routes(), config, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--baidu-port', type=int, default=8801)
+    parser.add_argument('--ocr-space-port', type=int, default=8802)
+    parser.add_argument('--latency', type=float, default=0.3, help='平均延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.05, help='延迟标准差（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='错误率 0~1')
+    args = parser.parse_args()
+
+    _, baidu_url = start_baidu(StandinConfig(args.latency, args.jitter, args.error_rate), args.host, args.baidu_port)
+    _, ocr_space_url = start_ocr_space(StandinConfig(args.latency, args.jitter, args.error_rate), args.host, args.ocr_space_port)
+    print(f"BAIDU_API_BASE={baidu_url}")
+    print(f"OCR_SPACE_API_URL={ocr_space_url}/parse/image")
+    print("按 Ctrl+C 停止")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
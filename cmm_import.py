@@ -0,0 +1,363 @@
+"""
+三坐标测量机（CMM）导出文件导入 - 直接读取机器导出数据，不经过OCR
+
+支持的格式（按文件开头自动识别）：
+    dmis    DMIS输出：F(PT1)=FEAT/POINT,CART,x,y,z,... 为理论值，FA(PT1)=... 为实测值
+    pcdmis  PC-DMIS文本报告：DIM ... 块，AX/NOMINAL/MEAS 表头下每行一个轴
+    table   带表头的CSV/TXT表格（PC-DMIS CSV、Calypso表格等），
+            按列名识别 名称/轴/理论值/实测值/公差 列，分隔符可为逗号、分号或制表符
+    xyz     纯坐标：每行 "x y z"、"编号 x y z" 或 "名称,x,y,z"
+
+逐行流式读取，不把整个文件读入内存，10万行文件可在一秒内完成。
+
+返回的 full_data 与页面“粘贴完整测量数据”的结构相同，可直接传给 update_sheet_data；
+只有理论值的文件（xyz、无FA的DMIS）只返回 points，由生成流程添加随机偏差。
+"""
+
+import io
+import re
+from itertools import chain, islice
+
+FORMATS = ('dmis', 'pcdmis', 'table', 'xyz')
+
+DEFAULT_TOLERANCE = 0.03
+
+# 识别格式时查看的行数
+SNIFF_LINES = 30
+
+_DMIS_FEATURE = re.compile(r'^\s*(FA?)\(([^)]+)\)\s*=\s*FEAT/\w+\s*,\s*CART\s*,(.*)$', re.IGNORECASE)
+_PCDMIS_DIM = re.compile(r'^\s*DIM\s+(\S+?)\s*=\s*(.*)$', re.IGNORECASE)
+_PCDMIS_FEATURE = re.compile(r'\bOF\s+\w+\s+(\S+)', re.IGNORECASE)
+_AXIS_SUFFIX = re.compile(r'^(.*?)[\s._\-:]+([XYZxyz])$')
+# 可直接作为测量点编号的名称：5、no.5、NO 5、测量点5
+_NUMBERED_LABEL = re.compile(r'^(?:no\.?|测量点)?\s*(\d+)$', re.IGNORECASE)
+
+# 表格列名（小写）
+_TABLE_COLUMNS = {
+    'label': ('name', 'label', 'feature', 'feature name', 'point', 'point name', 'id', 'characteristic', '测量点', '名称', '特征'),
+    'axis': ('axis', 'ax', '轴'),
+    'nominal': ('nominal', 'nom', 'nominal value', 'nominalvalue', 'theoretical', '理论值', '标称值'),
+    'actual': ('actual', 'meas', 'measured', 'measured value', 'actual value', 'actualvalue', '实测值', '测量值'),
+    'tol_max': ('+tol', 'uppertol', 'upper tol', 'utol', 'upper tolerance', '上公差'),
+    'tol_min': ('-tol', 'lowertol', 'lower tol', 'ltol', 'lower tolerance', '下公差'),
+}
+
+
+class CMMImportError(ValueError):
+    """导入文件格式错误"""
+
+
+def _to_float(text):
+    return float(text.strip().replace(',', '.')) if text and text.strip() else None
+
+
+def _split_delimited(line, delimiter):
+    return [cell.strip().strip('"') for cell in line.split(delimiter)]
+
+
+def _detect_delimiter(line):
+    for delimiter in ('\t', ';', ','):
+        if delimiter in line:
+            return delimiter
+    return None
+
+
+def _table_header(line):
+    """若该行是表格表头，返回 (分隔符, {字段: 列序号})"""
+    delimiter = _detect_delimiter(line)
+    if delimiter is None:
+        return None
+    names = [cell.lower() for cell in _split_delimited(line, delimiter)]
+    columns = {}
+    for field, aliases in _TABLE_COLUMNS.items():
+        for index, name in enumerate(names):
+            if name in aliases:
+                columns[field] = index
+                break
+    if 'nominal' in columns and ('actual' in columns or 'axis' in columns):
+        return delimiter, columns
+    return None
+
+
+def sniff_format(head):
+    """根据文件开头几行判断格式"""
+    for line in head:
+        if _DMIS_FEATURE.match(line) or line.lstrip().upper().startswith(('DMISMN', 'FILNAM')):
+            return 'dmis'
+    for line in head:
+        # AX 须是空格分隔的独立列名，CSV 表头 Axis,Nominal,Meas 不算
+        parts = line.upper().split()
+        if _PCDMIS_DIM.match(line) or (parts and parts[0] == 'AX' and 'NOMINAL' in parts and 'MEAS' in parts):
+            return 'pcdmis'
+    for line in head:
+        if _table_header(line):
+            return 'table'
+    return 'xyz'
+
+
+# ========== 各格式解析，统一产出 (名称, 轴, 理论值, 实测值或None, 下公差, 上公差) ==========
+
+def _iter_dmis(lines):
+    nominals = {}
+    for line in lines:
+        match = _DMIS_FEATURE.match(line)
+        if not match:
+            continue
+        kind, label = match.group(1).upper(), match.group(2).strip()
+        values = match.group(3).split(',')
+        if len(values) < 3:
+            continue
+        try:
+            xyz = [float(v) for v in values[:3]]
+        except ValueError:
+            continue
+        if kind == 'F':
+            nominals[label] = xyz
+        else:
+            nominal = nominals.pop(label, None)
+            if nominal is None:
+                continue
+            for axis, nom, act in zip('XYZ', nominal, xyz):
+                yield label, axis, nom, act, None, None
+
+    # 只有理论值、没有实测值的特征
+    for label, nominal in nominals.items():
+        for axis, nom in zip('XYZ', nominal):
+            yield label, axis, nom, None, None, None
+
+
+def _iter_pcdmis(lines):
+    label = None
+    columns = None
+    for line in lines:
+        dim = _PCDMIS_DIM.match(line)
+        if dim:
+            feature = _PCDMIS_FEATURE.search(dim.group(2))
+            label = feature.group(1) if feature else dim.group(1)
+            continue
+
+        parts = line.split()
+        if not parts:
+            continue
+        head = parts[0].upper()
+        if head == 'AX':
+            names = [p.upper() for p in parts]
+            columns = {name: index for index, name in enumerate(names)}
+            continue
+        if columns is None or head not in ('X', 'Y', 'Z') or label is None:
+            continue
+
+        try:
+            nominal = float(parts[columns['NOMINAL']])
+            actual = float(parts[columns['MEAS']]) if 'MEAS' in columns else None
+            tol_max = float(parts[columns['+TOL']]) if '+TOL' in columns else None
+            # PC-DMIS 的 -TOL 列通常为正数，表示下偏差的绝对值
+            tol_min = -abs(float(parts[columns['-TOL']])) if '-TOL' in columns else None
+        except (KeyError, IndexError, ValueError):
+            continue
+        yield label, head, nominal, actual, tol_min, tol_max
+
+
+def _iter_table(lines):
+    delimiter = columns = None
+    last_label = None
+    for line in lines:
+        if columns is None:
+            header = _table_header(line)
+            if header:
+                delimiter, columns = header
+            continue
+
+        cells = _split_delimited(line, delimiter)
+        try:
+            nominal = _to_float(cells[columns['nominal']])
+        except (IndexError, ValueError):
+            continue
+        if nominal is None:
+            continue
+
+        label = cells[columns['label']] if 'label' in columns and columns['label'] < len(cells) else ''
+        if 'axis' in columns and columns['axis'] < len(cells):
+            axis = cells[columns['axis']].upper()
+        else:
+            # 轴写在名称末尾，如 PT1.X / PT1_X / PT1 X
+            match = _AXIS_SUFFIX.match(label)
+            if not match:
+                continue
+            label, axis = match.group(1), match.group(2).upper()
+        if axis not in ('X', 'Y', 'Z'):
+            continue
+
+        # 与页面粘贴格式一致：名称只写在每个点的第一行
+        label = label or last_label
+        last_label = label
+
+        def optional(field):
+            index = columns.get(field)
+            if index is None or index >= len(cells):
+                return None
+            try:
+                return _to_float(cells[index])
+            except ValueError:
+                return None
+
+        # PC-DMIS CSV 的 -Tol 列为正数（下偏差的绝对值），与 _iter_pcdmis 一样统一为负数
+        tol_min = optional('tol_min')
+        if tol_min is not None:
+            tol_min = -abs(tol_min)
+
+        yield label, axis, nominal, optional('actual'), tol_min, optional('tol_max')
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _iter_xyz(lines, line_parser=None):
+    count = 0
+    for line in lines:
+        parts = line.replace(',', ' ').replace(';', ' ').split()
+        if len(parts) < 3:
+            continue
+        count += 1
+        label = str(count)
+        # 首列不是数字时为名称；恰好4列且首列为整数时为编号 "编号 x y z"；
+        # 其余情况（如 x y z i j k）首列是坐标，取前三个数
+        if len(parts) >= 4 and not _is_number(parts[0]):
+            label, parts = parts[0], parts[1:4]
+        elif len(parts) == 4 and parts[0].isdigit():
+            label, parts = parts[0], parts[1:4]
+        try:
+            values = [float(p) for p in parts[:3]]
+        except ValueError:
+            # 兜底：交给页面使用的单行解析器（x=.. y=.. z=.. no.N 等格式）
+            point = line_parser(line, count) if line_parser else None
+            if not point:
+                count -= 1
+                continue
+            label, values = str(point['id']), [point['x'], point['y'], point['z']]
+
+        for axis, value in zip('XYZ', values):
+            yield label, axis, value, None, None, None
+
+
+_PARSERS = {
+    'dmis': _iter_dmis,
+    'pcdmis': _iter_pcdmis,
+    'table': _iter_table,
+}
+
+
+def iter_records(lines, fmt=None, line_parser=None):
+    """流式解析，返回 (格式, 记录迭代器)"""
+    lines = iter(lines)
+    head = list(islice(lines, SNIFF_LINES))
+    fmt = fmt or sniff_format(head)
+    if fmt not in FORMATS:
+        raise CMMImportError(f"不支持的格式: {fmt}")
+    stream = chain(head, lines)
+    if fmt == 'xyz':
+        return fmt, _iter_xyz(stream, line_parser)
+    return fmt, _PARSERS[fmt](stream)
+
+
+def import_cmm(lines, fmt=None, tolerance=DEFAULT_TOLERANCE, line_parser=None):
+    """导入CMM导出数据
+
+    Args:
+        lines: 可迭代的文本行（文件对象、列表等）
+        fmt: 指定格式，默认自动识别
+        tolerance: 文件中没有公差时使用的默认公差
+        line_parser: xyz 格式无法直接解析的行交给该函数，签名同 parse_single_line
+
+    Returns:
+        dict: format, points（理论值，按出现顺序排列）,
+              full_data（有实测值时才有内容，结构同页面粘贴数据）
+
+        名称为数字或 no.N 时直接作为测量点编号（对应报告中的测量点块），
+        其他名称（如 PT1）按出现顺序使用未被占用的编号。
+        没有名称时（表格没有名称列）每组 X/Y/Z 为一个点，轴重复时开始下一个点。
+    """
+    fmt, records = iter_records(lines, fmt, line_parser)
+
+    points = {}
+    full_data = []
+    current = None
+    current_key = None
+    current_axes = set()
+    unnamed = 0
+    first_row = False
+
+    for label, axis, nominal, actual, tol_min, tol_max in records:
+        if label:
+            key = label
+        elif isinstance(current_key, int) and axis not in current_axes:
+            key = current_key
+        else:
+            # 无名称的点用序号作键，不会与名称冲突
+            unnamed += 1
+            key = unnamed
+        if key != current_key:
+            current_key = key
+            current_axes = set()
+            current = points.get(key)
+            if current is None:
+                current = points[key] = {'id': None, 'x': 0.0, 'y': 0.0, 'z': 0.0}
+                first_row = True
+        current_axes.add(axis)
+        current[axis.lower()] = nominal
+
+        if actual is not None:
+            tol_min = -tolerance if tol_min is None else tol_min
+            tol_max = tolerance if tol_max is None else tol_max
+            deviation = actual - nominal
+            full_data.append({
+                'pointId': current,  # 编号在全部读完后确定
+                'pointName': (label or '') if first_row else '',
+                'axis': axis,
+                'tolMin': tol_min,
+                'tolMax': tol_max,
+                'nominal': nominal,
+                'measured': actual,
+                'deviation': deviation,
+                'status': 'OK' if tol_min <= deviation <= tol_max else 'NG',
+            })
+            first_row = False
+
+    # 先保留数字编号，其余名称按出现顺序填入未占用的编号
+    used = set()
+    for key, point in points.items():
+        match = _NUMBERED_LABEL.match(key) if isinstance(key, str) else None
+        if match and int(match.group(1)) > 0 and int(match.group(1)) not in used:
+            point['id'] = int(match.group(1))
+            used.add(point['id'])
+    next_id = 1
+    for point in points.values():
+        if point['id'] is None:
+            while next_id in used:
+                next_id += 1
+            point['id'] = next_id
+            used.add(next_id)
+    for item in full_data:
+        item['pointId'] = item['pointId']['id']
+
+    return {'format': fmt, 'points': list(points.values()), 'full_data': full_data}
+
+
+def import_cmm_file(path, fmt=None, tolerance=DEFAULT_TOLERANCE, line_parser=None, encoding='utf-8-sig'):
+    """从文件导入，逐行读取"""
+    with open(path, encoding=encoding, errors='replace') as f:
+        return import_cmm(f, fmt, tolerance, line_parser)
+
+
+def import_cmm_stream(binary_stream, fmt=None, tolerance=DEFAULT_TOLERANCE, line_parser=None, encoding='utf-8-sig'):
+    """从二进制流（如上传文件）导入，逐行读取"""
+    text = io.TextIOWrapper(binary_stream, encoding=encoding, errors='replace')
+    try:
+        return import_cmm(text, fmt, tolerance, line_parser)
+    finally:
+        text.detach()
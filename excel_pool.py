@@ -0,0 +1,276 @@
+"""
+Excel生成进程池 - 把CPU密集的工作簿生成放到独立进程中执行，绕开GIL
+
+工作进程启动时预先导入openpyxl并分析所有已注册模板。
+请求以紧凑的JSON字节（json_codec）传给工作进程（测量点和完整数据压缩为 [编号, x, y, z] 形式的行），
+生成的工作簿写入临时目录，只把文件路径传回主进程，不通过管道传输整个文件。
+
+准入控制：正在执行和排队的任务数达到上限时直接抛出 PoolBusy，
+由调用方立即返回503，而不是无限排队。等待超时抛出 PoolTimeout，工作进程崩溃抛出 WorkerCrashed。
+
+工作进程中记录的阶段耗时和生成失败次数随结果一起返回，在主进程的指标中补记。
+主进程内执行的生成任务（按报告ID增量修改）用 admit() 占用同一组名额。
+
+用法：
+    pool = ExcelPool(workers=4, max_pending=8)
+    pool.start()
+    buffer, error = pool.generate(points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+    buffer, states, error = pool.generate_report(...)   # 同时返回各工作表状态，供增量生成缓存
+    with pool.admit():
+        ...  # 在主进程中生成
+"""
+
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from json_codec import codec
+from payload_schema import point_rows, measurement_rows
+
+
+class PoolBusy(Exception):
+    """进程池已满，拒绝新任务"""
+
+
+class PoolTimeout(Exception):
+    """等待工作进程生成结果超时"""
+
+
+class WorkerCrashed(Exception):
+    """工作进程异常退出，进程池已重置"""
+
+
+# ========== 请求编码 ==========
+
+def _pack_points(points):
+    return [list(row) for row in point_rows(points or [])]
+
+
+def _unpack_points(rows):
+    return [{'id': i, 'x': x, 'y': y, 'z': z} for i, x, y, z in rows]
+
+
+def _pack_full_data(full_data):
+    # 生成报告只用到点号、轴、理论值和实测值
+    if not full_data:
+        return None
+    return [list(row) for row in measurement_rows(full_data)]
+
+
+def _unpack_full_data(rows):
+    if not rows:
+        return None
+    return [{'pointId': p, 'axis': a, 'nominal': n, 'measured': m} for p, a, n, m in rows]
+
+
+def encode_request(points, sheet_name, tolerance, image_data, sheets_data, filename, template):
+    """把生成参数编码为紧凑的JSON字节"""
+    sheets = None
+    if sheets_data:
+        sheets = [{
+            'sheet_name': item['sheet_name'],
+            'points': _pack_points(item.get('points')),
+            'tolerance': item.get('tolerance', tolerance),
+            'image_data': item.get('image_data'),
+            'full_data': _pack_full_data(item.get('full_data')),
+        } for item in sheets_data]
+    payload = [_pack_points(points), sheet_name, tolerance, image_data, sheets, filename, template]
+    return codec.dumps_bytes(payload)
+
+
+def decode_request(payload):
+    points, sheet_name, tolerance, image_data, sheets, filename, template = codec.loads(payload)
+    if sheets:
+        for item in sheets:
+            item['points'] = _unpack_points(item['points'])
+            item['full_data'] = _unpack_full_data(item['full_data'])
+    return _unpack_points(points), sheet_name, tolerance, image_data, sheets, filename, template
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ========== 工作进程 ==========
+
+def _init_worker():
+    """工作进程初始化：预先导入openpyxl并分析模板"""
+    import web_app
+    web_app._load_openpyxl()
+    for name in web_app.template_registry.names():
+        try:
+            web_app.template_registry.get(name)
+        except Exception as e:
+            print(f"工作进程预加载模板 {name} 失败: {e}")
+
+
+def _ping():
+    return os.getpid()
+
+
+def _generate_to_file(payload, output_path, want_states=False):
+    """在工作进程中生成报告，写入 output_path
+
+    Returns:
+        {'error': 错误信息或 None, 'states': 各工作表状态（want_states 时）,
+         'stages': [(阶段, 秒)], 'failures': 本次新增的生成失败次数}
+    """
+    import web_app
+    failures = metrics.EXCEL_FAILURES.get()
+    with metrics.record_stages() as stages:
+        buffer, states, error = web_app.generate_report(*decode_request(payload))
+        if not error:
+            tmp_path = output_path + '.part'
+            with open(tmp_path, 'wb') as f:
+                f.write(buffer.getbuffer())
+            os.replace(tmp_path, output_path)
+    return {'error': error, 'states': states if want_states else None,
+            'stages': stages, 'failures': metrics.EXCEL_FAILURES.get() - failures}
+
+
+# ========== 进程池 ==========
+
+class ExcelPool:
+    """带准入控制的Excel生成进程池"""
+
+    def __init__(self, workers, max_pending=None, timeout=120, tmp_dir=None):
+        self.workers = workers
+        # 默认允许每个工作进程再排队一个任务
+        self.max_pending = max_pending or workers * 2
+        self.timeout = timeout
+        self.tmp_dir = tmp_dir
+        self._owns_tmp_dir = tmp_dir is None
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动工作进程并等待全部完成初始化，返回进程池"""
+        with self._lock:
+            if self._executor is None:
+                if self.tmp_dir is None:
+                    self.tmp_dir = tempfile.mkdtemp(prefix='xyzexcel_')
+                os.makedirs(self.tmp_dir, exist_ok=True)
+                # 用 spawn 启动：Web服务的其他线程（OCR请求等）可能正持有锁，fork 出的子进程会继承这些锁
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            executor = self._executor
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if self._owns_tmp_dir and self.tmp_dir:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            self.tmp_dir = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'running': self._executor is not None,
+            }
+
+    def _reset(self, executor):
+        """工作进程崩溃后丢弃旧的进程池，下次请求时重建"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.EXCEL_POOL_REJECTED.inc()
+                raise PoolBusy(f"Excel生成队列已满（{self._pending}/{self.max_pending}）")
+            self._pending += 1
+            metrics.EXCEL_POOL_PENDING.set(self._pending)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            metrics.EXCEL_POOL_PENDING.set(self._pending)
+
+    def _task_done(self, future, output_path):
+        self._release()
+        # 调用方已超时放弃时，清理工作进程写出的文件
+        if getattr(future, 'abandoned', False):
+            _remove_quietly(output_path)
+
+    @contextmanager
+    def admit(self):
+        """在主进程中执行生成任务时占用一个名额；已满时抛出 PoolBusy"""
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def generate(self, points, sheet_name, tolerance=0.03, image_data=None, sheets_data=None, filename=None, template=None):
+        """在工作进程中生成Excel，返回 (buffer, 错误)
+
+        进程池已满时抛出 PoolBusy，超时抛出 PoolTimeout，工作进程崩溃时抛出 WorkerCrashed。
+        """
+        buffer, _, error = self._run(False, points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+        return buffer, error
+
+    def generate_report(self, points, sheet_name, tolerance=0.03, image_data=None, sheets_data=None, filename=None, template=None):
+        """同 generate，另外返回各工作表状态：(buffer, 状态, 错误)"""
+        return self._run(True, points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+
+    def _run(self, want_states, points, sheet_name, tolerance, image_data, sheets_data, filename, template):
+        self._acquire()
+
+        output_path = None
+        try:
+            executor = self._executor or self.start()
+            output_path = os.path.join(self.tmp_dir, uuid.uuid4().hex + '.xlsx')
+            payload = encode_request(points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+            future = executor.submit(_generate_to_file, payload, output_path, want_states)
+        except Exception:
+            # 任务未能提交，直接释放名额
+            self._task_done(None, output_path or '')
+            raise
+        # 名额在任务真正结束时释放，调用方超时后仍在运行的任务也计入负载
+        future.add_done_callback(lambda f: self._task_done(f, output_path))
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.abandoned = True
+            if future.done():
+                _remove_quietly(output_path)
+            metrics.EXCEL_FAILURES.inc()
+            raise PoolTimeout(f"生成Excel超时（{self.timeout}秒）")
+        except BrokenProcessPool:
+            self._reset(executor)
+            metrics.EXCEL_FAILURES.inc()
+            raise WorkerCrashed("生成Excel失败: 工作进程异常退出")
+
+        metrics.observe_stages(result['stages'])
+        if result['failures']:
+            metrics.EXCEL_FAILURES.inc(result['failures'])
+        if result['error']:
+            return None, None, result['error']
+
+        with open(output_path, 'rb') as f:
+            buffer = io.BytesIO(f.read())
+        os.remove(output_path)
+        return buffer, result['states'], None
@@ -0,0 +1,102 @@
+"""
+JSON编解码器 - 可替换的JSON实现，用于请求/响应体和进程间传输
+
+按环境变量 XYZEXCEL_JSON_CODEC 选择 orjson / ujson / json；未指定时依次尝试
+orjson、ujson，都未安装则使用标准库 json。orjson 直接输出UTF-8字节，
+解析和序列化大数组（数万个测量值）时比标准库快数倍。
+
+用法：
+    from json_codec import codec, CodecJSONProvider
+    app.json = CodecJSONProvider(app)      # Flask的 get_json()/jsonify() 使用该编解码器
+    data = codec.loads(raw_bytes)
+    raw = codec.dumps_bytes(obj)
+"""
+
+import json
+import os
+from array import array
+
+from flask.json.provider import DefaultJSONProvider
+
+PREFERRED = ('orjson', 'ujson', 'json')
+
+
+def _default(obj):
+    """标准类型之外的对象：数组转列表，其余交给Flask默认处理（日期、UUID、dataclass等）"""
+    if isinstance(obj, array):
+        return obj.tolist()
+    return DefaultJSONProvider.default(obj)
+
+
+class JSONCodec:
+    """统一的编解码接口"""
+
+    def __init__(self, name, loads, dumps, dumps_bytes):
+        self.name = name
+        self.loads = loads              # str/bytes -> 对象
+        self.dumps = dumps              # 对象 -> str
+        self.dumps_bytes = dumps_bytes  # 对象 -> UTF-8 bytes
+
+
+def _make_orjson():
+    import orjson
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=option)
+
+    return JSONCodec('orjson', orjson.loads, lambda obj: dumps_bytes(obj).decode('utf-8'), dumps_bytes)
+
+
+def _make_ujson():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, ensure_ascii=False, default=_default)
+
+    return JSONCodec('ujson', ujson.loads, dumps, lambda obj: dumps(obj).encode('utf-8'))
+
+
+def _make_json():
+    def dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    return JSONCodec('json', json.loads, dumps, lambda obj: dumps(obj).encode('utf-8'))
+
+
+_FACTORIES = {'orjson': _make_orjson, 'ujson': _make_ujson, 'json': _make_json}
+
+
+def get_codec(name=None):
+    """返回指定的编解码器；未指定或未安装时按 PREFERRED 顺序选择可用的实现"""
+    if name:
+        if name not in _FACTORIES:
+            raise ValueError(f"未知的JSON编解码器: {name}（可选 {', '.join(PREFERRED)}）")
+        try:
+            return _FACTORIES[name]()
+        except ImportError:
+            print(f"JSON编解码器 {name} 未安装，改用其他实现")
+
+    for candidate in PREFERRED:
+        try:
+            return _FACTORIES[candidate]()
+        except ImportError:
+            continue
+
+
+codec = get_codec(os.environ.get('XYZEXCEL_JSON_CODEC'))
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """Flask JSON提供者：request.get_json() 和 jsonify() 使用 codec"""
+
+    def dumps(self, obj, **kwargs):
+        return codec.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        # 直接输出字节，省去 str -> bytes 的再编码
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(codec.dumps_bytes(obj), mimetype=self.mimetype)
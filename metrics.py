@@ -0,0 +1,221 @@
+"""
+轻量级指标收集 - 计数器、仪表盘、直方图，以Prometheus文本格式导出
+
+不依赖 prometheus_client，每次记录只是加锁后更新几个数字，可在生产环境常开。
+
+用法：
+    from metrics import Counter, stage
+    with stage('workbook_save'):
+        wb.save(buffer)
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 默认延迟桶（秒），覆盖从毫秒级解析到数十秒的OCR超时
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类：按标签值元组保存数据"""
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """可任意设置的瞬时值"""
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数..., +Inf桶计数, 总和]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels):
+        """返回 (观测次数, 总和)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return 0, 0.0
+            return sum(state[:-1]), state[-1]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(state[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+def render_all():
+    """按Prometheus文本格式导出所有已注册指标"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ========== 业务指标 ==========
+
+STAGE_SECONDS = Histogram(
+    'xyzexcel_stage_seconds', '各处理阶段耗时（秒）', ('stage',))
+HTTP_REQUEST_SECONDS = Histogram(
+    'xyzexcel_http_request_seconds', 'HTTP请求处理耗时（秒）', ('endpoint',))
+HTTP_REQUESTS = Counter(
+    'xyzexcel_http_requests_total', 'HTTP请求数', ('endpoint', 'status'))
+OCR_REQUESTS = Counter(
+    'xyzexcel_ocr_requests_total', 'OCR调用次数（result 为 circuit_open/rate_limited 时表示被跳过）', ('provider', 'result'))
+OCR_FALLBACKS = Counter(
+    'xyzexcel_ocr_fallbacks_total', 'OCR回退到备用方案的次数', ('from_provider',))
+OCR_CIRCUIT_STATE = Gauge(
+    'xyzexcel_ocr_circuit_state', 'OCR服务熔断器状态（0 正常，1 半开，2 熔断）', ('provider',))
+EXCEL_FAILURES = Counter(
+    'xyzexcel_excel_failures_total', 'Excel生成失败次数')
+REPORT_GENERATIONS = Counter(
+    'xyzexcel_report_generations_total', '按报告ID生成Excel的次数（完整/增量）', ('mode',))
+EXCEL_POOL_PENDING = Gauge(
+    'xyzexcel_excel_pool_pending', 'Excel生成进程池中执行和排队的任务数')
+EXCEL_POOL_REJECTED = Counter(
+    'xyzexcel_excel_pool_rejected_total', 'Excel生成进程池已满而拒绝的请求数')
+REQUEST_PAYLOAD_BYTES = Gauge(
+    'xyzexcel_request_payload_bytes', '最近一次请求体大小（字节）', ('endpoint',))
+RESPONSE_PAYLOAD_BYTES = Gauge(
+    'xyzexcel_response_payload_bytes', '最近一次响应体大小（字节）', ('endpoint',))
+POINTS_COUNT = Gauge(
+    'xyzexcel_points_count', '最近一次请求的测量点数量', ('endpoint',))
+
+
+_recording = threading.local()
+
+
+@contextmanager
+def stage(name):
+    """计时上下文：with stage('workbook_save'): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=name)
+        log = getattr(_recording, 'log', None)
+        if log is not None:
+            log.append((name, seconds))
+
+
+@contextmanager
+def record_stages():
+    """记录本线程内完成的各阶段耗时，产生 [(阶段, 秒)] 列表
+
+    进程池工作进程中的指标只记录在工作进程里，用它把耗时随结果带回主进程，由 observe_stages 补记。
+    """
+    previous = getattr(_recording, 'log', None)
+    _recording.log = log = []
+    try:
+        yield log
+    finally:
+        _recording.log = previous
+
+
+def observe_stages(stages):
+    """把工作进程带回的各阶段耗时记入本进程的 STAGE_SECONDS"""
+    for name, seconds in stages:
+        STAGE_SECONDS.observe(seconds, stage=name)
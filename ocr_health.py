@@ -0,0 +1,193 @@
+"""
+OCR服务健康跟踪 - 滚动错误率/延迟、熔断器、令牌桶限流
+
+每个OCR服务一个 ProviderHealth：
+    - 记录最近一段时间（窗口）内每次调用的成败和耗时，计算错误率和延迟分位数
+    - 熔断器：窗口内调用数达到下限且错误率超过阈值时熔断（open），冷却期内直接跳过该服务；
+      冷却期过后进入半开（half_open），只放行一个探测请求，成功则恢复（closed），失败则重新熔断；
+      只有这个探测请求的结果会改变状态，熔断前已发出、之后才完成的调用只计入统计
+    - 令牌桶限流：保证不超过服务商的QPS配额，取不到令牌时短暂等待，仍取不到则跳过
+
+用法：
+    health = ProviderHealth('baidu', qps=2)
+    allowed, reason, probe = health.allow()
+    if allowed:
+        start = time.perf_counter()
+        ok = call()
+        health.record(ok, time.perf_counter() - start, probe=probe)
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# 导出到指标时使用的数值
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class TokenBucket:
+    """令牌桶限流器：平均速率 rate 个/秒，最多积累 burst 个"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait=0.0):
+        """取一个令牌，最多等待 max_wait 秒，返回是否成功"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class ProviderHealth:
+    """单个OCR服务的健康状态与熔断器"""
+
+    def __init__(self, name, window=60.0, min_calls=5, error_threshold=0.5, cooldown=30.0,
+                 qps=0, burst=None, max_wait=1.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self.limiter = TokenBucket(qps, burst) if qps else None
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.last_error = None
+        self.skipped = {'circuit_open': 0, 'rate_limited': 0}
+        self._calls = deque()  # (时间, 是否成功, 耗时)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+
+    def allow(self):
+        """判断本次能否调用该服务，返回 (是否放行, 跳过原因, 是否为探测请求)
+
+        放行的是探测请求时，调用结束后须以 record(..., probe=True) 报告结果。
+        """
+        probe = False
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.skipped['circuit_open'] += 1
+                    return False, 'circuit_open', False
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                # 半开状态只放行一个探测请求
+                if self._probing:
+                    self.skipped['circuit_open'] += 1
+                    return False, 'circuit_open', False
+                self._probing = probe = True
+
+        if self.limiter is not None and not self.limiter.acquire(self.max_wait):
+            with self._lock:
+                if probe:
+                    self._probing = False
+                self.skipped['rate_limited'] += 1
+            return False, 'rate_limited', False
+        return True, None, probe
+
+    def record(self, ok, latency, error=None, probe=False):
+        """记录一次调用结果；probe 为 allow() 返回的探测标志"""
+        with self._lock:
+            now = time.monotonic()
+            self._calls.append((now, ok, latency))
+            self._trim(now)
+            if not ok:
+                self.last_error = error
+
+            if probe:
+                if self.state != HALF_OPEN:
+                    # 探测期间被 reset() 等改变了状态
+                    return
+                self._probing = False
+                if ok:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    print(f"OCR服务 {self.name} 探测成功，恢复调用")
+                else:
+                    self._open(now)
+                return
+
+            if self.state != CLOSED:
+                # 熔断前发出的调用：只计入统计，不改变状态
+                return
+
+            if not ok and len(self._calls) >= self.min_calls:
+                failures = sum(1 for _, success, _ in self._calls if not success)
+                if failures / len(self._calls) >= self.error_threshold:
+                    self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        print(f"OCR服务 {self.name} 熔断 {self.cooldown:.0f}s: {self.last_error}")
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.opened_at = None
+            self._probing = False
+            self._calls.clear()
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            calls = list(self._calls)
+            state = self.state
+            if state == OPEN and now - self.opened_at >= self.cooldown:
+                state = HALF_OPEN
+            info = {
+                'name': self.name,
+                'state': state,
+                'window_seconds': self.window,
+                'calls': len(calls),
+                'errors': sum(1 for _, ok, _ in calls if not ok),
+                'last_error': self.last_error,
+                'skipped': dict(self.skipped),
+                'cooldown_remaining': round(max(0.0, self.cooldown - (now - self.opened_at)), 1) if self.state == OPEN else 0.0,
+            }
+
+        info['error_rate'] = round(info['errors'] / len(calls), 3) if calls else 0.0
+        latencies = sorted(latency for _, _, latency in calls)
+        if latencies:
+            info['latency_ms'] = {
+                'avg': round(sum(latencies) / len(latencies) * 1000, 1),
+                'p50': round(latencies[len(latencies) // 2] * 1000, 1),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1),
+            }
+        if self.limiter is not None:
+            info['rate_limit'] = {'qps': self.limiter.rate, 'burst': self.limiter.burst,
+                                  'tokens': round(self.limiter.available(), 2)}
+        return info
@@ -0,0 +1,364 @@
+"""
+请求体模式校验 - 模式在导入时编译一次，校验的同时把测量点和完整数据转换为类型化数组
+
+模式用字典声明（JSON Schema的一个子集），compile_schema 把它编译为嵌套的转换函数：
+    {'type': 'object', 'properties': {...}, 'required': [...], 'require_any': [...]}
+    {'type': 'string' | 'number' | 'integer', 'default': ..., 'nullable': True, 'minimum': ...}
+    {'type': 'array', 'items': {...}, 'max_items': ...}
+字段值为 null 时：nullable 字段保留 None，其余字段视为未提供。
+    {'type': 'points'}        -> PointTable（id/x/y/z 四列 array）
+    {'type': 'measurements'}  -> MeasurementTable（pointId/axis/nominal/measured 四列）
+    两者可加 'max_id': N，限制测量点编号在 1~N 之间
+
+测量点和完整数据只遍历一遍：数值直接追加到 array 中，遇到字符串等非常规值才逐字段转换，
+出错时给出字段路径（如 sheets_data[1].points[3].x），在生成工作簿之前拒绝请求。
+
+PointTable / MeasurementTable 迭代时仍产生与原来相同的字典，已有代码无需修改；
+热点路径通过 point_rows() / measurement_rows() 直接按列读取。
+"""
+
+import os
+from array import array
+from functools import partial
+
+# 生成Excel时的测量点编号上限：编号决定插入的行数，过大的编号会让生成时间失控
+# 只用于 /generate_excel 的模式，只生成CSV的接口不限制
+MAX_POINT_ID = int(os.environ.get('XYZEXCEL_MAX_POINT_ID', 10000))
+
+AXES = ('X', 'Y', 'Z')
+
+
+class PayloadError(ValueError):
+    """请求体不符合模式"""
+
+    def __init__(self, path, message):
+        super().__init__(f"{path}: {message}" if path else message)
+        self.path = path
+
+
+# ========== 类型化表 ==========
+
+class PointTable:
+    """测量点坐标表：id 为 int64 数组，x/y/z 为 double 数组"""
+
+    __slots__ = ('ids', 'x', 'y', 'z')
+
+    def __init__(self, ids=None, x=None, y=None, z=None):
+        self.ids = ids if ids is not None else array('q')
+        self.x = x if x is not None else array('d')
+        self.y = y if y is not None else array('d')
+        self.z = z if z is not None else array('d')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for i, x, y, z in zip(self.ids, self.x, self.y, self.z):
+            yield {'id': i, 'x': x, 'y': y, 'z': z}
+
+    def rows(self):
+        return zip(self.ids, self.x, self.y, self.z)
+
+    def to_list(self):
+        return list(self)
+
+
+class MeasurementTable:
+    """完整测量数据表：每行一个轴（点号、轴、理论值、实测值）"""
+
+    __slots__ = ('point_ids', 'axes', 'nominal', 'measured')
+
+    def __init__(self, point_ids=None, axes='', nominal=None, measured=None):
+        self.point_ids = point_ids if point_ids is not None else array('q')
+        self.axes = axes  # 每行一个字符，如 'XYZXYZ'
+        self.nominal = nominal if nominal is not None else array('d')
+        self.measured = measured if measured is not None else array('d')
+
+    def __len__(self):
+        return len(self.point_ids)
+
+    def __iter__(self):
+        for p, a, n, m in self.rows():
+            yield {'pointId': p, 'axis': a, 'nominal': n, 'measured': m}
+
+    def rows(self):
+        return zip(self.point_ids, self.axes, self.nominal, self.measured)
+
+    def to_list(self):
+        return list(self)
+
+
+def point_rows(points):
+    """按 (编号, x, y, z) 遍历测量点，兼容 PointTable 和字典列表"""
+    if isinstance(points, PointTable):
+        return points.rows()
+    return ((p['id'], float(p['x']), float(p['y']), float(p['z'])) for p in points)
+
+
+def measurement_rows(full_data):
+    """按 (点号, 轴, 理论值, 实测值) 遍历完整数据，兼容 MeasurementTable 和字典列表"""
+    if isinstance(full_data, MeasurementTable):
+        return full_data.rows()
+    return ((item.get('pointId', 1), item.get('axis', 'X').upper(),
+             float(item.get('nominal', 0)), float(item.get('measured', 0))) for item in full_data)
+
+
+# ========== 标量转换 ==========
+
+def _to_number(value, path):
+    if isinstance(value, bool):
+        raise PayloadError(path, '需要数字')
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise PayloadError(path, '需要数字')
+
+
+def _to_integer(value, path):
+    if isinstance(value, bool):
+        raise PayloadError(path, '需要整数')
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise PayloadError(path, '需要整数')
+
+
+def _check_ids(ids, path, key, max_id):
+    if ids and (min(ids) < 1 or max(ids) > max_id):
+        index = next(i for i, v in enumerate(ids) if v < 1 or v > max_id)
+        raise PayloadError(f"{path}[{index}].{key}", f"测量点编号须在 1~{max_id} 之间")
+
+
+# ========== 测量点 / 完整数据（单遍转换） ==========
+
+def _convert_points(value, path, max_id=None):
+    if not isinstance(value, list):
+        raise PayloadError(path, '需要数组')
+
+    table = PointTable()
+    ids, xs, ys, zs = table.ids, table.x, table.y, table.z
+    for index, p in enumerate(value):
+        try:
+            i, x, y, z = p['id'], p['x'], p['y'], p['z']
+            # array 会把 true/false 当作 1/0 接受，交给逐字段转换报错
+            if i.__class__ is bool or x.__class__ is bool or y.__class__ is bool or z.__class__ is bool:
+                raise TypeError
+            ids.append(i)
+            xs.append(x)
+            ys.append(y)
+            zs.append(z)
+        except (TypeError, KeyError, OverflowError):
+            # 非常规值（字符串数字、布尔值、缺字段、类型错误）：回退到逐字段转换，出错时给出准确路径
+            del ids[index:], xs[index:], ys[index:], zs[index:]
+            item_path = f"{path}[{index}]"
+            if not isinstance(p, dict):
+                raise PayloadError(item_path, '需要对象')
+            for key in ('id', 'x', 'y', 'z'):
+                if key not in p:
+                    raise PayloadError(f"{item_path}.{key}", '缺少字段')
+            ids.append(_to_integer(p['id'], f"{item_path}.id"))
+            xs.append(_to_number(p['x'], f"{item_path}.x"))
+            ys.append(_to_number(p['y'], f"{item_path}.y"))
+            zs.append(_to_number(p['z'], f"{item_path}.z"))
+
+    if max_id is not None:
+        _check_ids(ids, path, 'id', max_id)
+    return table
+
+
+def _convert_measurements(value, path, max_id=None):
+    if not isinstance(value, list):
+        raise PayloadError(path, '需要数组')
+
+    table = MeasurementTable()
+    point_ids, nominal, measured = table.point_ids, table.nominal, table.measured
+    axes = []
+    for index, item in enumerate(value):
+        try:
+            get = item.get
+            p, a, n, m = get('pointId', 1), get('axis', 'X'), get('nominal', 0), get('measured', 0)
+            if p.__class__ is bool or n.__class__ is bool or m.__class__ is bool:
+                raise TypeError
+            point_ids.append(p)
+            nominal.append(n)
+            measured.append(m)
+            axes.append(a)
+        except (AttributeError, TypeError, OverflowError):
+            del point_ids[index:], nominal[index:], measured[index:], axes[index:]
+            item_path = f"{path}[{index}]"
+            if not isinstance(item, dict):
+                raise PayloadError(item_path, '需要对象')
+            point_ids.append(_to_integer(item.get('pointId', 1), f"{item_path}.pointId"))
+            nominal.append(_to_number(item.get('nominal', 0), f"{item_path}.nominal"))
+            measured.append(_to_number(item.get('measured', 0), f"{item_path}.measured"))
+            axes.append(item.get('axis', 'X'))
+
+    # 轴名：拼成一个字符串后整体检查，只有出错时才逐项定位
+    try:
+        axes_text = ''.join(axes).upper()
+    except TypeError:
+        axes_text = ''
+    if len(axes_text) != len(axes) or axes_text.strip('XYZ'):
+        index = next(i for i, a in enumerate(axes) if not isinstance(a, str) or a.upper() not in AXES)
+        raise PayloadError(f"{path}[{index}].axis", '轴名须为 X/Y/Z')
+    table.axes = axes_text
+
+    if max_id is not None:
+        _check_ids(point_ids, path, 'pointId', max_id)
+    return table
+
+
+# ========== 模式编译 ==========
+
+def _compile_object(schema):
+    fields = [(name, compile_schema(sub), sub) for name, sub in schema.get('properties', {}).items()]
+    required = tuple(schema.get('required', ()))
+    require_any = tuple(schema.get('require_any', ()))
+
+    def convert(value, path):
+        if not isinstance(value, dict):
+            raise PayloadError(path, '需要对象')
+        for name in required:
+            if value.get(name) is None:
+                raise PayloadError(f"{path}.{name}" if path else name, '缺少字段')
+
+        result = {}
+        for name, field_convert, sub in fields:
+            field_path = f"{path}.{name}" if path else name
+            field_value = value.get(name)
+            # 非 nullable 字段为 null 时视为未提供（使用默认值）
+            if field_value is not None or (name in value and sub.get('nullable')):
+                result[name] = field_convert(field_value, field_path)
+            elif 'default' in sub:
+                result[name] = sub['default']
+
+        if require_any and not any(result.get(name) for name in require_any):
+            raise PayloadError(path, '没有坐标数据')
+        return result
+
+    return convert
+
+
+def _compile_array(schema):
+    item_convert = compile_schema(schema['items'])
+    max_items = schema.get('max_items')
+
+    def convert(value, path):
+        if not isinstance(value, list):
+            raise PayloadError(path, '需要数组')
+        if max_items is not None and len(value) > max_items:
+            raise PayloadError(path, f"最多 {max_items} 项")
+        return [item_convert(item, f"{path}[{index}]") for index, item in enumerate(value)]
+
+    return convert
+
+
+def _compile_scalar(schema):
+    kind = schema['type']
+    minimum = schema.get('minimum')
+
+    def convert(value, path):
+        if kind == 'string':
+            if not isinstance(value, str):
+                raise PayloadError(path, '需要字符串')
+            return value
+        result = _to_number(value, path) if kind == 'number' else _to_integer(value, path)
+        if minimum is not None and result < minimum:
+            raise PayloadError(path, f"不能小于 {minimum}")
+        return result
+
+    return convert
+
+
+_COMPILERS = {
+    'object': _compile_object,
+    'array': _compile_array,
+    'string': _compile_scalar,
+    'number': _compile_scalar,
+    'integer': _compile_scalar,
+    'points': lambda schema: partial(_convert_points, max_id=schema.get('max_id')),
+    'measurements': lambda schema: partial(_convert_measurements, max_id=schema.get('max_id')),
+}
+
+
+def compile_schema(schema):
+    """把模式编译为转换函数 convert(value, path)，不符合时抛出 PayloadError"""
+    convert = _COMPILERS[schema['type']](schema)
+    if not schema.get('nullable'):
+        return convert
+
+    def nullable(value, path):
+        return None if value is None else convert(value, path)
+
+    return nullable
+
+
+class Validator:
+    """编译后的模式"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._convert = compile_schema(schema)
+
+    def validate(self, data):
+        """返回转换后的数据，不符合模式时抛出 PayloadError"""
+        return self._convert(data, '')
+
+
+# ========== 各接口的请求体模式 ==========
+
+TOLERANCE = {'type': 'number', 'minimum': 0, 'default': 0.03}
+
+GENERATE = Validator({
+    'type': 'object',
+    'properties': {
+        'coordinates': {'type': 'string', 'default': ''},
+        'tolerance': TOLERANCE,
+    },
+})
+
+GENERATE_FROM_POINTS = Validator({
+    'type': 'object',
+    'properties': {
+        'points': {'type': 'points', 'default': []},
+        'tolerance': TOLERANCE,
+    },
+})
+
+SHEET = {
+    'type': 'object',
+    'required': ['sheet_name'],
+    'require_any': ['points', 'full_data'],
+    'properties': {
+        'sheet_name': {'type': 'string'},
+        'points': {'type': 'points', 'max_id': MAX_POINT_ID, 'default': []},
+        # 未提供时沿用请求的公差，不设默认值
+        'tolerance': {'type': 'number', 'minimum': 0},
+        'image_data': {'type': 'string', 'nullable': True},
+        'full_data': {'type': 'measurements', 'max_id': MAX_POINT_ID, 'nullable': True},
+    },
+}
+
+GENERATE_EXCEL = Validator({
+    'type': 'object',
+    'properties': {
+        'sheets_data': {'type': 'array', 'items': SHEET, 'max_items': 16, 'nullable': True},
+        'points': {'type': 'points', 'max_id': MAX_POINT_ID, 'default': []},
+        'sheet_name': {'type': 'string', 'default': '前模仁'},
+        'image_data': {'type': 'string', 'nullable': True},
+        'filename': {'type': 'string', 'default': ''},
+        'tolerance': TOLERANCE,
+        'template': {'type': 'string', 'nullable': True},
+        'report_id': {'type': 'string', 'nullable': True},
+    },
+})
@@ -0,0 +1,148 @@
+"""
+按请求开启的性能剖析 - 在生产环境中针对单个请求生成火焰图数据
+
+两种模式：
+    sample   采样剖析（默认），定时抓取请求线程的调用栈，输出折叠栈格式 (.collapsed)，
+             可直接用于 flamegraph.pl 或拖入 https://www.speedscope.app
+    cprofile 确定性剖析，输出 pstats 文件 (.prof)，可用 snakeviz / flameprof 查看
+
+每个剖析结果旁边会写一个同名 .json 文件，记录接口、请求体大小和耗时。
+指定 keep 时，写出后只保留最近 keep 个剖析结果，更早的连同 .json 一起删除。
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+MODES = ('sample', 'cprofile')
+EXTENSIONS = ('.prof', '.collapsed')
+
+
+def prune_profiles(output_dir, keep):
+    """只保留最近 keep 个剖析结果（文件名以时间戳开头，按名称排序即按时间排序）"""
+    names = sorted(n for n in os.listdir(output_dir) if n.endswith(EXTENSIONS))
+    for name in names[:max(len(names) - keep, 0)]:
+        base = os.path.splitext(name)[0]
+        for path in (name, base + '.json'):
+            try:
+                os.remove(os.path.join(output_dir, path))
+            except FileNotFoundError:
+                pass
+
+
+class SamplingProfiler:
+    """采样剖析器：后台线程按固定间隔记录目标线程的调用栈"""
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _frame_label(self, frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_label(frame))
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[';'.join(stack)] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path):
+        """以折叠栈格式写出：每行 "帧1;帧2;帧3 次数" """
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfile:
+    """单次请求的剖析会话"""
+
+    def __init__(self, output_dir, endpoint, payload_bytes=0, mode='sample', interval=0.005, keep=None):
+        if mode not in MODES:
+            raise ValueError(f"不支持的剖析模式: {mode}")
+        self.output_dir = output_dir
+        self.endpoint = endpoint or 'unknown'
+        self.payload_bytes = payload_bytes or 0
+        self.mode = mode
+        self.interval = interval
+        self.keep = keep
+        self._profiler = None
+        self._start = None
+        self.output_path = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(interval=self.interval)
+            self._profiler.start()
+        return self
+
+    def stop(self):
+        """停止剖析并写出结果，返回结果文件路径"""
+        if self._profiler is None:
+            return None
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        duration = time.perf_counter() - self._start
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        base = os.path.join(self.output_dir, f"{timestamp}_{self.endpoint}_{self.payload_bytes}b")
+        ext = '.prof' if self.mode == 'cprofile' else '.collapsed'
+        self.output_path = base + ext
+
+        if self.mode == 'cprofile':
+            self._profiler.dump_stats(self.output_path)
+        else:
+            self._profiler.write(self.output_path)
+
+        meta = {
+            'endpoint': self.endpoint,
+            'payload_bytes': self.payload_bytes,
+            'mode': self.mode,
+            'duration_seconds': round(duration, 6),
+            'profile': os.path.basename(self.output_path),
+        }
+        if self.mode == 'sample':
+            meta['samples'] = self._profiler.samples
+            meta['interval_seconds'] = self.interval
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        self._profiler = None
+        if self.keep:
+            prune_profiles(self.output_dir, self.keep)
+        return self.output_path
@@ -0,0 +1,111 @@
+"""
+已生成报告的缓存 - 保留最近生成的工作簿，用于小改动后的增量重新生成
+
+按报告ID保存工作簿对象及各工作表已写入的数值。容量按条目数、测量点总数和估算内存三项限制，
+超出时淘汰最久未使用的条目；超过空闲时间的条目也会被淘汰。
+估算内存 = 单元格数 × CELL_BYTES + 嵌入图片的字节数。
+
+在进程池中完整生成的报告，主进程没有工作簿对象，只缓存生成的文件（按文件大小计），
+第一次增量修改时再加载为工作簿（attach）。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# 单个openpyxl单元格（对象、值、样式数组）在内存中的大致字节数，按 tracemalloc 实测取整
+CELL_BYTES = 300
+
+
+def estimate_workbook_bytes(wb, images=()):
+    """估算工作簿占用的内存"""
+    cells = sum(len(ws._cells) for ws in wb.worksheets)
+    return cells * CELL_BYTES + sum(len(data) for _, data in images)
+
+
+class ReportEntry:
+    """单个报告的缓存状态"""
+
+    def __init__(self, wb, template_name, template_mtime, filename, sheets, images=(), data=None):
+        self.wb = wb
+        # wb 为 None 时保存生成的xlsx文件内容，待加载
+        self.data = data
+        self.template_name = template_name
+        self.template_mtime = template_mtime
+        self.filename = filename
+        # {工作表名: {'max_point', 'tolerance', 'image', 'full_data', 'values': {(点, 轴): (理论值, 实测值)}}}
+        self.sheets = sheets
+        # [(openpyxl图片, 原始字节)]，再次保存前用于重建图片数据流
+        self.images = list(images)
+        self.size_bytes = estimate_workbook_bytes(wb, self.images) if wb is not None else len(data)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def attach(self, wb, images=()):
+        """用加载好的工作簿替换缓存的文件内容（之后需重新 put 以更新内存估算）"""
+        self.wb = wb
+        self.images = list(images)
+        self.data = None
+        self.size_bytes = estimate_workbook_bytes(wb, self.images)
+
+    @property
+    def weight(self):
+        return sum(sheet['max_point'] for sheet in self.sheets.values())
+
+
+class ReportCache:
+    """线程安全的LRU缓存"""
+
+    def __init__(self, max_entries=16, max_points=20000, ttl=1800, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_points = max_points
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, report_id):
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(report_id)
+            if entry is not None:
+                self._entries.move_to_end(report_id)
+                entry.last_used = time.monotonic()
+            return entry
+
+    def put(self, report_id, entry):
+        with self._lock:
+            self._entries[report_id] = entry
+            self._entries.move_to_end(report_id)
+            entry.last_used = time.monotonic()
+            self._expire()
+            self._evict()
+
+    def discard(self, report_id):
+        with self._lock:
+            self._entries.pop(report_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'points': sum(e.weight for e in self._entries.values()),
+                'bytes': sum(e.size_bytes for e in self._entries.values()),
+                'max_entries': self.max_entries,
+                'max_points': self.max_points,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        for report_id in [k for k, e in self._entries.items() if e.last_used < deadline]:
+            del self._entries[report_id]
+
+    def _evict(self):
+        points = sum(e.weight for e in self._entries.values())
+        size = sum(e.size_bytes for e in self._entries.values())
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or points > self.max_points or size > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            points -= entry.weight
+            size -= entry.size_bytes
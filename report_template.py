@@ -0,0 +1,246 @@
+"""
+Excel报告模板注册表 - 每个模板只分析一次，缓存版面描述
+
+版面描述（SheetLayout）记录每个工作表的：
+    产品件号单元格、测量点块起始行、块间距、块内行数、各轴所在行偏移、
+    理论值/实测值/偏差列、图片区域，以及模板中已有的测量点数量。
+生成报告时直接使用这些信息，不再逐行扫描工作表或使用写死的行号。
+
+模板文件修改后（修改时间变化）会自动重新分析。
+
+注册方式：
+    registry.register('model', 'model.xlsx')
+    或环境变量 XYZEXCEL_EXCEL_TEMPLATES="客户A=/path/a.xlsx;客户B=/path/b.xlsx"
+"""
+
+import io
+import os
+import threading
+
+POINT_LABEL = '测量点'
+PART_NO_LABEL = '产品件号'
+
+# 找不到对应表头时使用的默认值（与 model.xlsx 一致）
+DEFAULT_BLOCK_HEIGHT = 6
+DEFAULT_VALUE_COLUMNS = (7, 8, 9)
+DEFAULT_IMAGE_ANCHOR = 'A7'
+
+# 产品件号后缀
+PART_NO_SUFFIXES = {'前模仁': '-CAV1（A）'}
+DEFAULT_PART_NO_SUFFIX = '-COR1（B）'
+
+
+class TemplateError(Exception):
+    """模板不存在或无法识别版面"""
+
+
+class SheetLayout:
+    """单个工作表的版面描述"""
+
+    def __init__(self, sheet_name, block_start, block_height, block_rows, point_count,
+                 axis_offsets, nominal_col, measured_col, deviation_col,
+                 label_col=1, part_no_cell=None, image_range=None, image_anchor=DEFAULT_IMAGE_ANCHOR):
+        self.sheet_name = sheet_name
+        self.block_start = block_start
+        self.block_height = block_height
+        self.block_rows = block_rows
+        self.point_count = point_count
+        self.axis_offsets = axis_offsets
+        self.nominal_col = nominal_col
+        self.measured_col = measured_col
+        self.deviation_col = deviation_col
+        self.label_col = label_col
+        self.part_no_cell = part_no_cell
+        self.image_range = image_range
+        self.image_anchor = image_anchor
+        self.part_no_suffix = PART_NO_SUFFIXES.get(sheet_name, DEFAULT_PART_NO_SUFFIX)
+        # 新增测量点时复制的源块：有第二个块时用第二个块（与第一个块的格式可能不同）
+        self.copy_source_row = block_start + block_height if point_count >= 2 else block_start
+
+    def block_row(self, point):
+        """第 point 个测量点块的起始行"""
+        return self.block_start + (point - 1) * self.block_height
+
+    def axis_row(self, point, axis):
+        """第 point 个测量点某个轴所在行"""
+        return self.block_row(point) + self.axis_offsets[axis]
+
+    def to_dict(self):
+        return {
+            'sheet_name': self.sheet_name,
+            'block_start': self.block_start,
+            'block_height': self.block_height,
+            'block_rows': self.block_rows,
+            'point_count': self.point_count,
+            'axis_offsets': self.axis_offsets,
+            'value_columns': [self.nominal_col, self.measured_col, self.deviation_col],
+            'part_no_cell': self.part_no_cell,
+            'image_range': self.image_range,
+        }
+
+
+def analyze_sheet(ws):
+    """分析工作表，返回 SheetLayout"""
+    label_rows = []
+    for row in range(1, ws.max_row + 1):
+        value = ws.cell(row, 1).value
+        if value and POINT_LABEL in str(value):
+            label_rows.append(row)
+    if not label_rows:
+        raise TemplateError(f"工作表 '{ws.title}' 中未找到{POINT_LABEL}")
+
+    block_start = label_rows[0]
+    block_height = label_rows[1] - label_rows[0] if len(label_rows) >= 2 else DEFAULT_BLOCK_HEIGHT
+
+    # 块内各轴所在行和表头列
+    axis_offsets = {}
+    columns = {}
+    for row in range(block_start, block_start + block_height):
+        for col in range(1, ws.max_column + 1):
+            value = ws.cell(row, col).value
+            if not isinstance(value, str):
+                continue
+            text = value.strip()
+            if text in ('X', 'Y', 'Z') and text not in axis_offsets:
+                axis_offsets[text] = row - block_start
+            lower = text.lower()
+            if lower == 'nominal':
+                columns.setdefault('nominal', col)
+            elif lower == 'measured':
+                columns.setdefault('measured', col)
+            elif lower.startswith('dev'):
+                columns.setdefault('deviation', col)
+    if set(axis_offsets) != {'X', 'Y', 'Z'}:
+        raise TemplateError(f"工作表 '{ws.title}' 的测量点块中未找到 X/Y/Z 行")
+
+    block_rows = max(axis_offsets.values()) + 1
+
+    # 产品件号：标签右侧的单元格
+    part_no_cell = None
+    for row in range(1, block_start):
+        for col in range(1, ws.max_column + 1):
+            if ws.cell(row, col).value == PART_NO_LABEL:
+                part_no_cell = (row, col + 1)
+                break
+        if part_no_cell:
+            break
+
+    # 图片区域：表头与第一个测量点之间面积最大的合并单元格
+    header_row = part_no_cell[0] if part_no_cell else 0
+    image_range = None
+    best_area = 0
+    for rng in ws.merged_cells.ranges:
+        if rng.min_row > header_row and rng.max_row < block_start:
+            area = (rng.max_row - rng.min_row + 1) * (rng.max_col - rng.min_col + 1)
+            if area > best_area:
+                best_area = area
+                image_range = rng.coord
+
+    return SheetLayout(
+        ws.title,
+        block_start=block_start,
+        block_height=block_height,
+        block_rows=block_rows,
+        point_count=len(label_rows),
+        axis_offsets=axis_offsets,
+        nominal_col=columns.get('nominal', DEFAULT_VALUE_COLUMNS[0]),
+        measured_col=columns.get('measured', DEFAULT_VALUE_COLUMNS[1]),
+        deviation_col=columns.get('deviation', DEFAULT_VALUE_COLUMNS[2]),
+        part_no_cell=part_no_cell,
+        image_range=image_range,
+        image_anchor=image_range.split(':')[0] if image_range else DEFAULT_IMAGE_ANCHOR,
+    )
+
+
+class ReportTemplate:
+    """已分析的模板：文件内容 + 各工作表版面"""
+
+    def __init__(self, name, path, mtime, data, layouts, errors):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.data = data
+        self.layouts = layouts
+        self.errors = errors
+
+    def load_workbook(self):
+        import openpyxl
+        return openpyxl.load_workbook(io.BytesIO(self.data))
+
+    def to_dict(self):
+        # 对外列出模板，只给文件名，不暴露服务器上的路径
+        return {
+            'name': self.name,
+            'file': os.path.basename(self.path),
+            'sheets': {name: layout.to_dict() for name, layout in self.layouts.items()},
+            'errors': self.errors,
+        }
+
+
+def analyze_template(name, path):
+    """读取并分析模板文件"""
+    import openpyxl
+
+    mtime = os.path.getmtime(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    wb = openpyxl.load_workbook(io.BytesIO(data))
+    layouts = {}
+    errors = {}
+    try:
+        for ws in wb.worksheets:
+            try:
+                layouts[ws.title] = analyze_sheet(ws)
+            except TemplateError as e:
+                # 非报告工作表（如说明页）不影响其他工作表
+                errors[ws.title] = str(e)
+    finally:
+        wb.close()
+
+    return ReportTemplate(name, path, mtime, data, layouts, errors)
+
+
+class TemplateRegistry:
+    """模板注册表，线程安全，按修改时间自动刷新"""
+
+    def __init__(self, default=None):
+        self.default = default
+        self._paths = {}
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path):
+        with self._lock:
+            self._paths[name] = path
+            self._templates.pop(name, None)
+            if self.default is None:
+                self.default = name
+
+    def register_from_env(self, value):
+        """解析 "名称=路径;名称=路径" 格式的配置"""
+        for item in (value or '').split(';'):
+            name, sep, path = item.partition('=')
+            if sep and name.strip() and path.strip():
+                self.register(name.strip(), path.strip())
+
+    def names(self):
+        with self._lock:
+            return list(self._paths)
+
+    def get(self, name=None):
+        """返回 ReportTemplate，文件变化时重新分析"""
+        name = name or self.default
+        with self._lock:
+            path = self._paths.get(name)
+            if path is None:
+                raise TemplateError(f"模板 '{name}' 未注册")
+            if not os.path.exists(path):
+                # 错误信息会返回给客户端，只给文件名
+                print(f"模板 '{name}' 的文件不存在: {path}")
+                raise TemplateError(f"模板文件不存在: {os.path.basename(path)}")
+
+            template = self._templates.get(name)
+            if template is None or template.mtime != os.path.getmtime(path):
+                template = self._templates[name] = analyze_template(name, path)
+            return template
@@ -0,0 +1,27 @@
+import base64
+import io
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+sys.path.insert(0, ROOT)
+
+
+def png_data_uri():
+    """生成一张小PNG图片的 data URI，用于测试图片嵌入"""
+    PILImage = pytest.importorskip('PIL.Image')
+    buffer = io.BytesIO()
+    PILImage.new('RGB', (200, 120), 'red').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+@pytest.fixture
+def payload():
+    """录制的多表 /generate_excel 请求体"""
+    with open(os.path.join(ROOT, 'benchmarks', 'fixtures', 'sheets_data.json'), encoding='utf-8') as f:
+        return json.load(f)
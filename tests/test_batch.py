@@ -0,0 +1,19 @@
+"""批量生成：按文件名识别报告和工作表"""
+
+import pytest
+
+import batch
+
+
+@pytest.mark.parametrize('stem, expected', [
+    ('P25-488-前门扶手-前模仁', ('P25-488-前门扶手', '前模仁')),
+    ('P25-488-前门扶手-后模仁', ('P25-488-前门扶手', '后模仁')),
+    ('P25-488-Cavity-lid-后模仁', ('P25-488-Cavity-lid', '后模仁')),
+    ('P25-200-record', ('P25-200-record', '前模仁')),
+    ('P25-100-backplate', ('P25-100-backplate', '前模仁')),
+    ('P25-100-backplate_cor', ('P25-100-backplate', '后模仁')),
+    ('P25-100 front', ('P25-100', '前模仁')),
+    ('P25-100-cav-lid', ('P25-100-lid', '前模仁')),
+])
+def test_split_sheet_matches_whole_tokens(stem, expected):
+    assert batch._split_sheet(stem) == expected
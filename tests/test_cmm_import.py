@@ -0,0 +1,95 @@
+"""三坐标测量机导出文件导入：各格式的小样本"""
+
+import os
+
+import pytest
+
+import cmm_import
+from conftest import FIXTURES_DIR
+
+
+def load(name, **kwargs):
+    return cmm_import.import_cmm_file(os.path.join(FIXTURES_DIR, 'cmm', name), **kwargs)
+
+
+def test_xyz_ijk_first_column_is_coordinate():
+    result = load('xyz_ijk.txt')
+    assert result['format'] == 'xyz'
+    assert result['full_data'] == []
+    assert result['points'] == [
+        {'id': 1, 'x': 100.0, 'y': 20.5, 'z': 30.1},
+        {'id': 2, 'x': 101.5, 'y': 20.5, 'z': 30.1},
+        {'id': 3, 'x': 1.0, 'y': 2.0, 'z': 3.0},
+        {'id': 4, 'x': 4.0, 'y': 5.0, 'z': 6.0},
+    ]
+
+
+def test_table_negative_tolerance_is_normalised():
+    result = load('pcdmis_table.csv')
+    assert result['format'] == 'table'
+    rows = result['full_data']
+    assert [r['axis'] for r in rows] == ['X', 'Y', 'Z']
+    assert all(r['tolMin'] == -0.05 and r['tolMax'] == 0.05 for r in rows)
+    assert [r['status'] for r in rows] == ['OK', 'NG', 'OK']
+    assert rows[1]['deviation'] == pytest.approx(-0.07)
+
+
+def test_numbered_labels_keep_their_point_id():
+    result = load('xyz_numbered.txt')
+    assert [p['id'] for p in result['points']] == [5, 9]
+    assert result['points'][1] == {'id': 9, 'x': 4.0, 'y': 5.0, 'z': 6.0}
+
+
+def test_named_labels_fill_unused_ids():
+    lines = ['PT1 1 2 3', '2 4 5 6', 'PT3 7 8 9']
+    result = cmm_import.import_cmm(lines, 'xyz')
+    assert [p['id'] for p in result['points']] == [1, 2, 3]
+    lines = ['PT1 1 2 3', '1 4 5 6']
+    assert [p['id'] for p in cmm_import.import_cmm(lines, 'xyz')['points']] == [2, 1]
+
+
+def test_dmis_skips_malformed_feature():
+    result = load('sample.dmo')
+    assert result['format'] == 'dmis'
+    assert [(r['pointName'], r['axis']) for r in result['full_data']][::3] == [('PT1', 'X'), ('PT3', 'X')]
+    assert [r['measured'] for r in result['full_data'][3:]] == [12.0, 22.05, 32.0]
+    assert [r['status'] for r in result['full_data'][3:]] == ['OK', 'NG', 'OK']
+
+
+def test_pcdmis_report():
+    result = load('sample_report.txt')
+    assert result['format'] == 'pcdmis'
+    # PT7 不是数字编号，按出现顺序编号
+    assert result['points'] == [{'id': 1, 'x': 10.0, 'y': 20.0, 'z': 30.0}]
+    assert result['full_data'][0]['pointName'] == 'PT7'
+    assert [r['status'] for r in result['full_data']] == ['OK', 'NG', 'OK']
+    assert all(r['tolMin'] == -0.05 for r in result['full_data'])
+
+
+def test_import_route_survives_malformed_dmis_line():
+    import web_app
+
+    with open(os.path.join(FIXTURES_DIR, 'cmm', 'sample.dmo'), 'rb') as f:
+        response = web_app.app.test_client().post('/import_cmm', data={'file': (f, 'sample.dmo')},
+                                                  content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['points_count'] == 2
+
+
+def test_table_without_name_column_groups_xyz_rows():
+    result = load('table_no_name.csv')
+    assert result['format'] == 'table'
+    assert result['points'] == [
+        {'id': 1, 'x': 10.0, 'y': 20.0, 'z': 30.0},
+        {'id': 2, 'x': 11.0, 'y': 21.0, 'z': 31.0},
+    ]
+    assert [r['pointId'] for r in result['full_data']] == [1, 1, 1, 2, 2, 2]
+    assert [r['status'] for r in result['full_data']] == ['OK', 'NG', 'OK', 'OK', 'OK', 'OK']
+
+
+def test_csv_axis_header_is_table_not_pcdmis():
+    result = load('axis_meas.csv')
+    assert result['format'] == 'table'
+    assert result['points'] == [{'id': 1, 'x': 5.0, 'y': 6.0, 'z': 7.0}]
+    assert [r['status'] for r in result['full_data']] == ['OK', 'OK', 'NG']
+    assert cmm_import.sniff_format(['AX    NOMINAL     +TOL     -TOL     MEAS']) == 'pcdmis'
@@ -0,0 +1,76 @@
+"""Excel生成进程池：指标带回主进程、超时返回504、按报告ID生成时与增量修改配合"""
+
+import io
+
+import pytest
+
+openpyxl = pytest.importorskip('openpyxl')
+
+import metrics  # noqa: E402
+import web_app  # noqa: E402
+from conftest import png_data_uri  # noqa: E402
+from excel_pool import ExcelPool  # noqa: E402
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ExcelPool(workers=1, timeout=60)
+    pool.start()
+    monkeypatch.setattr(web_app, '_excel_pool', pool)
+    monkeypatch.setitem(web_app.app.config, 'EXCEL_WORKERS', 1)
+    yield pool
+    pool.shutdown()
+
+
+def test_worker_stage_timings_reach_parent(pool, payload):
+    count, _ = metrics.STAGE_SECONDS.snapshot(stage='workbook_save')
+    buffer, error = pool.generate([], '前模仁', 0.03, None, payload['sheets_data'], 'a.xlsx', None)
+    assert error is None and buffer.getbuffer().nbytes > 0
+    assert metrics.STAGE_SECONDS.snapshot(stage='workbook_save')[0] == count + 1
+
+
+def test_worker_failures_reach_parent(pool, payload):
+    failures = metrics.EXCEL_FAILURES.get()
+    # 工作表名不在模板中，工作进程里生成失败
+    sheets = [dict(payload['sheets_data'][0], sheet_name='不存在')]
+    buffer, error = pool.generate([], '前模仁', 0.03, None, sheets, 'a.xlsx', None)
+    assert buffer is None and error
+    assert metrics.EXCEL_FAILURES.get() == failures + 1
+
+
+def test_pool_timeout_returns_504(pool, payload):
+    pool.timeout = 0.001
+    response = web_app.app.test_client().post('/generate_excel', json=payload)
+    assert response.status_code == 504
+
+
+def test_report_first_build_in_pool_then_patch_locally(pool, payload):
+    client = web_app.app.test_client()
+    body = dict(payload, report_id='pool-report')
+    for item in body['sheets_data']:
+        item['image_data'] = png_data_uri()
+    response = client.post('/generate_excel', json=body)
+    assert response.headers['X-Report-Generation'] == 'full'
+    # 主进程只缓存了生成的文件
+    assert web_app.report_cache.get('pool-report').wb is None
+
+    for value in (9.999, 8.888):
+        body['sheets_data'][1]['full_data'][0]['measured'] = value
+        response = client.post('/generate_excel', json=body)
+        assert response.headers['X-Report-Generation'] == 'incremental'
+        wb = openpyxl.load_workbook(io.BytesIO(response.data))
+        layout = web_app.template_registry.get().layouts['后模仁']
+        assert wb['后模仁'].cell(layout.axis_row(1, 'X'), layout.measured_col).value == value
+        assert all(len(ws._images) == 1 for ws in wb.worksheets)
+
+
+def test_local_patch_counts_against_pool_limit(pool, payload):
+    client = web_app.app.test_client()
+    body = dict(payload, report_id='pool-busy')
+    assert client.post('/generate_excel', json=body).status_code == 200
+
+    pool.max_pending = 0
+    body['sheets_data'][1]['full_data'][0]['measured'] = 9.999
+    response = client.post('/generate_excel', json=body)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
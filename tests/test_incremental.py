@@ -0,0 +1,69 @@
+"""增量重新生成：同一 report_id 再次生成时只改写变化的单元格"""
+
+import io
+
+import pytest
+
+openpyxl = pytest.importorskip('openpyxl')
+
+import web_app  # noqa: E402
+from conftest import png_data_uri  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return web_app.app.test_client()
+
+
+def test_incremental_patch_writes_changed_value(client, payload):
+    body = dict(payload, report_id='test-values')
+    assert client.post('/generate_excel', json=body).headers['X-Report-Generation'] == 'full'
+
+    body['sheets_data'][1]['full_data'][0]['measured'] = 9.999
+    response = client.post('/generate_excel', json=body)
+    assert response.headers['X-Report-Generation'] == 'incremental'
+
+    wb = openpyxl.load_workbook(io.BytesIO(response.data))
+    layout = web_app.template_registry.get().layouts['后模仁']
+    assert wb['后模仁'].cell(layout.axis_row(1, 'X'), layout.measured_col).value == 9.999
+
+
+def test_incremental_save_twice_with_image(client, payload):
+    # openpyxl 第一次保存时会关闭图片数据流，第二次保存必须仍然成功并保留图片
+    image = png_data_uri()
+    for item in payload['sheets_data']:
+        item['image_data'] = image
+    body = dict(payload, report_id='test-image')
+
+    assert client.post('/generate_excel', json=body).headers['X-Report-Generation'] == 'full'
+    for value in (9.999, 8.888):
+        body['sheets_data'][1]['full_data'][0]['measured'] = value
+        response = client.post('/generate_excel', json=body)
+        assert response.status_code == 200
+        assert response.headers['X-Report-Generation'] == 'incremental'
+
+        wb = openpyxl.load_workbook(io.BytesIO(response.data))
+        assert all(len(ws._images) == 1 for ws in wb.worksheets)
+
+
+def test_report_cache_evicts_by_estimated_bytes(client, payload):
+    from report_cache import ReportCache
+
+    web_app.generate_excel_incremental('size-probe', [], None, sheets_data=payload['sheets_data'], filename='a.xlsx')
+    entry = web_app.report_cache.get('size-probe')
+    assert entry.size_bytes > 0
+
+    cache = ReportCache(max_entries=16, max_points=10 ** 6, max_bytes=entry.size_bytes * 2)
+    for report_id in ('a', 'b', 'c'):
+        cache.put(report_id, entry)
+    assert cache.stats()['entries'] == 2
+    assert cache.get('a') is None
+
+
+def test_points_count_counts_points_not_axis_rows(client, payload):
+    import metrics
+
+    client.post('/generate_excel', json=payload)
+    expected = sum(len({m['pointId'] for m in item['full_data']}) if item.get('full_data') else len(item['points'])
+                   for item in payload['sheets_data'])
+    assert metrics.POINTS_COUNT.get(endpoint='generate_excel') == expected
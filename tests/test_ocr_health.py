@@ -0,0 +1,100 @@
+"""OCR服务熔断器和令牌桶限流的状态转换"""
+
+import pytest
+
+import ocr_health
+from ocr_health import CLOSED, HALF_OPEN, OPEN, ProviderHealth, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ocr_health.time, 'monotonic', clock)
+    return clock
+
+
+def _open_breaker(health):
+    for _ in range(health.min_calls):
+        assert health.allow()[0]
+        health.record(False, 0.1, 'boom')
+    assert health.state == OPEN
+
+
+@pytest.fixture
+def health(clock):
+    return ProviderHealth('test', window=60, min_calls=3, error_threshold=0.5, cooldown=30)
+
+
+def test_opens_when_error_rate_exceeds_threshold(health):
+    health.record(True, 0.1)
+    health.record(False, 0.1, 'boom')
+    assert health.state == CLOSED  # 调用数未达到下限
+    health.record(False, 0.1, 'boom')
+    assert health.state == OPEN
+    assert health.allow() == (False, 'circuit_open', False)
+
+
+def test_half_open_allows_single_probe(health, clock):
+    _open_breaker(health)
+    clock.now += 31
+    assert health.allow() == (True, None, True)
+    assert health.state == HALF_OPEN
+    assert health.allow() == (False, 'circuit_open', False)
+
+
+@pytest.mark.parametrize('ok, state', [(True, CLOSED), (False, OPEN)])
+def test_probe_result_decides_state(health, clock, ok, state):
+    _open_breaker(health)
+    clock.now += 31
+    _, _, probe = health.allow()
+    health.record(ok, 0.1, None if ok else 'boom', probe=probe)
+    assert health.state == state
+
+
+@pytest.mark.parametrize('ok', [True, False])
+def test_stale_call_does_not_change_half_open_state(health, clock, ok):
+    _open_breaker(health)
+    clock.now += 31
+    assert health.allow()[2]
+    # 熔断前发出的调用在探测期间完成
+    health.record(ok, 5.0, None if ok else 'late')
+    assert health.state == HALF_OPEN
+    assert health.allow() == (False, 'circuit_open', False)
+
+
+def test_stale_failure_while_open_keeps_cooldown(health, clock):
+    _open_breaker(health)
+    opened_at = health.opened_at
+    clock.now += 10
+    health.record(False, 5.0, 'late')
+    assert health.state == OPEN and health.opened_at == opened_at
+
+
+def test_rate_limited_probe_releases_probe_slot(clock):
+    health = ProviderHealth('test', min_calls=1, cooldown=30, qps=1, max_wait=0)
+    health.record(False, 0.1, 'boom')
+    clock.now += 31
+    health.limiter._tokens = 0
+    health.limiter._updated = clock.now
+    assert health.allow() == (False, 'rate_limited', False)
+    clock.now += 1
+    assert health.allow() == (True, None, True)
+
+
+def test_token_bucket_burst_and_refill(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.acquire() and bucket.acquire()
+    assert not bucket.acquire(max_wait=0)
+    clock.now += 0.5
+    assert bucket.acquire(max_wait=0)
+    assert not bucket.acquire(max_wait=0)
+    clock.now += 10
+    assert bucket.available() == 2
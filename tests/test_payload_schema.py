@@ -0,0 +1,95 @@
+"""请求体模式校验和JSON编解码器"""
+
+import importlib.util
+
+import pytest
+
+import payload_schema
+import web_app
+from payload_schema import MAX_POINT_ID, PayloadError
+
+
+def _points(count):
+    return [{'id': i, 'x': 1.0, 'y': 2.0, 'z': 3.0} for i in range(1, count + 1)]
+
+
+def test_point_id_cap_only_applies_to_excel():
+    points = _points(MAX_POINT_ID + 1)
+    assert len(payload_schema.GENERATE_FROM_POINTS.validate({'points': points})['points']) == MAX_POINT_ID + 1
+    with pytest.raises(PayloadError) as excinfo:
+        payload_schema.GENERATE_EXCEL.validate({'points': points})
+    assert excinfo.value.path == f'points[{MAX_POINT_ID}].id'
+
+
+def test_generate_from_points_accepts_large_ids():
+    response = web_app.app.test_client().post('/generate_from_points',
+                                              json={'points': [{'id': 12000, 'x': 1, 'y': 2, 'z': 3}]})
+    assert response.status_code == 200
+
+
+def test_null_optional_fields_use_defaults():
+    data = payload_schema.GENERATE_EXCEL.validate({
+        'filename': None, 'points': None, 'tolerance': None, 'image_data': None,
+        'sheets_data': [{'sheet_name': '前模仁', 'points': _points(1), 'tolerance': None}],
+    })
+    assert data['filename'] == ''
+    assert len(data['points']) == 0
+    assert data['tolerance'] == 0.03
+    assert data['image_data'] is None
+    assert 'tolerance' not in data['sheets_data'][0]
+
+
+def test_generate_excel_accepts_null_optional_fields():
+    body = {'filename': None, 'points': None,
+            'sheets_data': [{'sheet_name': '前模仁', 'points': _points(2)}]}
+    assert web_app.app.test_client().post('/generate_excel', json=body).status_code == 200
+
+
+@pytest.mark.parametrize('body, path', [
+    ({'points': [{'id': 1, 'x': 1, 'y': 2, 'z': 3}, {'id': 2, 'x': 'abc', 'y': 2, 'z': 3}]}, 'points[1].x'),
+    ({'points': [{'id': 1, 'x': 1, 'y': 2}]}, 'points[0].z'),
+    ({'points': [{'id': True, 'x': 1, 'y': 2, 'z': 3}]}, 'points[0].id'),
+    ({'points': [{'id': 1, 'x': 1, 'y': False, 'z': 3}]}, 'points[0].y'),
+    ({'points': [5]}, 'points[0]'),
+    ({'sheets_data': [{'sheet_name': '前模仁', 'full_data': [{'pointId': 1, 'axis': 'W'}]}]},
+     'sheets_data[0].full_data[0].axis'),
+    ({'sheets_data': [{'sheet_name': '前模仁', 'full_data': [{'pointId': 1, 'measured': True}]}]},
+     'sheets_data[0].full_data[0].measured'),
+    ({'sheets_data': [{'sheet_name': '前模仁', 'full_data': ['X']}]}, 'sheets_data[0].full_data[0]'),
+    ({'sheets_data': ['前模仁']}, 'sheets_data[0]'),
+    ({'sheets_data': [{'points': _points(1)}]}, 'sheets_data[0].sheet_name'),
+])
+def test_rejections_report_field_path(body, path):
+    with pytest.raises(PayloadError) as excinfo:
+        payload_schema.GENERATE_EXCEL.validate(body)
+    assert excinfo.value.path == path
+    assert str(excinfo.value).startswith(path + ': ')
+
+
+def test_rejection_is_returned_as_400_with_path():
+    response = web_app.app.test_client().post('/generate_from_points',
+                                              json={'points': [{'id': 1, 'x': True, 'y': 2, 'z': 3}]})
+    assert response.status_code == 400
+    assert 'points[0].x' in response.get_json()['error']
+
+
+HAS_ORJSON = importlib.util.find_spec('orjson') is not None
+
+
+@pytest.mark.parametrize('name', ['json', pytest.param('orjson', marks=pytest.mark.skipif(not HAS_ORJSON, reason='orjson未安装'))])
+def test_codec_round_trip(name):
+    from json_codec import get_codec
+
+    codec = get_codec(name)
+    assert codec.name == name
+    data = payload_schema.GENERATE_EXCEL.validate({
+        'filename': '报告',
+        'sheets_data': [{'sheet_name': '后模仁', 'points': _points(2),
+                         'full_data': [{'pointId': 1, 'axis': 'y', 'nominal': 1.5, 'measured': '1.25'}]}],
+    })
+    sheet = data['sheets_data'][0]
+    # array 列序列化为列表
+    encoded = codec.dumps_bytes({'ids': sheet['points'].ids, 'nominal': sheet['full_data'].nominal, 'name': '报告'})
+    assert codec.loads(encoded) == {'ids': [1, 2], 'nominal': [1.5], 'name': '报告'}
+    assert codec.loads(codec.dumps(sheet['full_data'].to_list())) == [
+        {'pointId': 1, 'axis': 'Y', 'nominal': 1.5, 'measured': 1.25}]
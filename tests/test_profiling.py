@@ -0,0 +1,50 @@
+"""按请求剖析：令牌校验和剖析结果数量上限"""
+
+import os
+
+import pytest
+
+import web_app
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setitem(web_app.app.config, 'PROFILING_ENABLED', True)
+    monkeypatch.setitem(web_app.app.config, 'PROFILING_TOKEN', 'secret')
+    monkeypatch.setitem(web_app.app.config, 'PROFILING_DIR', str(tmp_path))
+    monkeypatch.setitem(web_app.app.config, 'PROFILING_MAX_FILES', 2)
+    return tmp_path
+
+
+def _profile(token):
+    response = web_app.app.test_client().get('/templates', headers={'X-Profile': token})
+    return response.headers.get('X-Profile-Output')
+
+
+def test_empty_token_disables_profiling(profiling, monkeypatch):
+    monkeypatch.setitem(web_app.app.config, 'PROFILING_TOKEN', '')
+    assert _profile('anything') is None
+    assert os.listdir(profiling) == []
+
+
+def test_wrong_token_is_ignored(profiling):
+    assert _profile('wrong') is None
+    assert _profile('错误') is None
+
+
+def test_only_latest_profiles_are_kept(profiling):
+    outputs = [_profile('secret') for _ in range(4)]
+    assert all(outputs)
+    assert sorted(os.listdir(profiling)) == sorted(
+        name for output in outputs[-2:] for name in (output, os.path.splitext(output)[0] + '.json'))
+
+
+def test_token_in_query_string_is_ignored(profiling):
+    response = web_app.app.test_client().get('/templates?profile=secret')
+    assert response.headers.get('X-Profile-Output') is None
+    assert os.listdir(profiling) == []
+
+
+def test_query_selects_mode(profiling):
+    response = web_app.app.test_client().get('/templates?profile_mode=cprofile', headers={'X-Profile': 'secret'})
+    assert response.headers['X-Profile-Output'].endswith('.prof')
@@ -0,0 +1,18 @@
+"""模板列表接口"""
+
+import pytest
+
+pytest.importorskip('openpyxl')
+
+import web_app  # noqa: E402
+
+
+def test_template_listing_hides_server_paths(monkeypatch, tmp_path):
+    missing = str(tmp_path / 'missing.xlsx')
+    monkeypatch.setitem(web_app.template_registry._paths, 'missing', missing)
+    body = web_app.app.test_client().get('/templates').get_json()
+    text = web_app.app.json.dumps(body)
+    assert str(tmp_path) not in text and web_app.EXCEL_TEMPLATE_PATH not in text
+    listing = {t['name']: t for t in body['templates']}
+    assert listing['model']['file'] == 'model.xlsx'
+    assert listing['missing']['error'] == '模板文件不存在: missing.xlsx'
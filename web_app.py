@@ -9,7 +9,7 @@ Flask Web Application - 支持图片上传OCR识别
     http://localhost:5000
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, g, Response
 import random
 import re
 import io
@@ -18,62 +18,199 @@ import base64
 import urllib.request
 import urllib.parse
 import json
+import hmac
+import hashlib
+import time
+import threading
+import importlib.util
 from datetime import datetime
 from copy import copy
+from contextlib import nullcontext
+
+import metrics
+import cmm_import
+from metrics import stage
+from report_template import TemplateRegistry, TemplateError, analyze_sheet
+from report_cache import ReportCache, ReportEntry
+from excel_pool import ExcelPool, PoolBusy, PoolTimeout, WorkerCrashed
+from ocr_health import ProviderHealth, STATE_VALUES
+from json_codec import CodecJSONProvider
+import payload_schema
+from payload_schema import PayloadError, point_rows, measurement_rows
+from profiling import RequestProfile, MODES as PROFILE_MODES
 
 # Excel处理
-try:
-    import openpyxl
-    from openpyxl.utils import get_column_letter
-    from openpyxl.drawing.image import Image as ExcelImage
-    from openpyxl.drawing.spreadsheet_drawing import OneCellAnchor, AnchorMarker
-    from openpyxl.drawing.xdr import XDRPositiveSize2D
-    HAS_OPENPYXL = True
-except ImportError:
-    HAS_OPENPYXL = False
+# openpyxl 及其绘图/图片模块导入较慢，只检查是否安装，首次使用时再导入（见 _load_openpyxl）
+HAS_OPENPYXL = importlib.util.find_spec('openpyxl') is not None
+if not HAS_OPENPYXL:
     print("警告: openpyxl未安装，Excel功能不可用。请运行: pip install openpyxl")
 
+openpyxl = None
+get_column_letter = None
+ExcelImage = None
+OneCellAnchor = None
+AnchorMarker = None
+XDRPositiveSize2D = None
+CellRange = None
+
 # Excel模板路径
 EXCEL_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), 'model.xlsx')
 
+# Excel模板注册表：每个模板只分析一次版面，请求时按名称选择（默认 model）
+template_registry = TemplateRegistry(default='model')
+template_registry.register('model', EXCEL_TEMPLATE_PATH)
+template_registry.register_from_env(os.environ.get('XYZEXCEL_EXCEL_TEMPLATES'))
+
+# 最近生成的报告（按 report_id），用于小改动后的增量重新生成
+report_cache = ReportCache(
+    max_entries=int(os.environ.get('XYZEXCEL_REPORT_CACHE_ENTRIES', 16)),
+    max_points=int(os.environ.get('XYZEXCEL_REPORT_CACHE_POINTS', 20000)),
+    ttl=int(os.environ.get('XYZEXCEL_REPORT_CACHE_TTL', 1800)),
+    max_bytes=int(os.environ.get('XYZEXCEL_REPORT_CACHE_BYTES', 256 * 1024 * 1024))
+)
+
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 最大16MB
+# 请求/响应JSON使用可替换的编解码器（默认优先orjson，见 json_codec.py）
+app.json = CodecJSONProvider(app)
+
+# 请求剖析（默认关闭）：开启后，X-Profile 头与令牌匹配的请求会被剖析
+# （令牌只从请求头读取，查询参数会被写入访问日志）
+# 必须设置令牌，未设置时剖析不生效；只保留最近 PROFILING_MAX_FILES 个剖析结果
+# 可选 X-Profile-Mode 头或 ?profile_mode= 参数选择 sample（默认）或 cprofile
+app.config['PROFILING_ENABLED'] = os.environ.get('XYZEXCEL_PROFILING', '') == '1'
+app.config['PROFILING_TOKEN'] = os.environ.get('XYZEXCEL_PROFILING_TOKEN', '')
+app.config['PROFILING_DIR'] = os.environ.get('XYZEXCEL_PROFILING_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+app.config['PROFILING_MAX_FILES'] = int(os.environ.get('XYZEXCEL_PROFILING_MAX_FILES', 50))
+if app.config['PROFILING_ENABLED'] and not app.config['PROFILING_TOKEN']:
+    print("警告: 已开启请求剖析但未设置 XYZEXCEL_PROFILING_TOKEN，剖析不会生效")
+
+# Excel生成进程池（默认关闭，在请求线程中生成）：设置进程数后 /generate_excel 在工作进程中生成，
+# 执行和排队的任务数超过 EXCEL_MAX_PENDING 时直接返回503
+app.config['EXCEL_WORKERS'] = int(os.environ.get('XYZEXCEL_EXCEL_WORKERS', 0))
+app.config['EXCEL_MAX_PENDING'] = int(os.environ.get('XYZEXCEL_EXCEL_MAX_PENDING', 0))  # 0 表示进程数的2倍
+app.config['EXCEL_TIMEOUT'] = int(os.environ.get('XYZEXCEL_EXCEL_TIMEOUT', 120))
 
 # ========== 百度 OCR 配置 ==========
 # 请在百度AI开放平台申请: https://console.bce.baidu.com/ai/#/ai/ocr/overview/index
-BAIDU_API_KEY = 'bHq1UFwjFAeimASHLP3xXxBh'  # 填入你的 API Key
-BAIDU_SECRET_KEY = 'UyhQrOEjHkJEBinnmrnxa27QfNO5SuLg'  # 填入你的 Secret Key
+# 可通过环境变量覆盖（设为空字符串则禁用百度OCR）
+BAIDU_API_KEY = os.environ.get('BAIDU_API_KEY', 'bHq1UFwjFAeimASHLP3xXxBh')  # 填入你的 API Key
+BAIDU_SECRET_KEY = os.environ.get('BAIDU_SECRET_KEY', 'UyhQrOEjHkJEBinnmrnxa27QfNO5SuLg')  # 填入你的 Secret Key
+# 接口地址，压测时可指向本地替身服务（见 benchmarks/ocr_standins.py）
+BAIDU_API_BASE = os.environ.get('BAIDU_API_BASE', 'https://aip.baidubce.com').rstrip('/')
 # ==================================
 
 # 备用: OCR.space 免费API
-OCR_SPACE_API_KEY = 'K85551736788957'
-OCR_SPACE_API_URL = 'https://api.ocr.space/parse/image'
-
-
-def get_baidu_access_token():
-    """获取百度API访问令牌"""
+OCR_SPACE_API_KEY = os.environ.get('OCR_SPACE_API_KEY', 'K85551736788957')
+OCR_SPACE_API_URL = os.environ.get('OCR_SPACE_API_URL', 'https://api.ocr.space/parse/image')
+
+# OCR服务健康跟踪：窗口内错误率超过阈值时熔断，冷却期内直接跳过该服务，之后放行探测请求
+# QPS 为服务商配额（百度通用文字识别高精度版免费额度为2），0 表示不限流
+OCR_HEALTH_WINDOW = float(os.environ.get('XYZEXCEL_OCR_WINDOW', 60))
+OCR_HEALTH_MIN_CALLS = int(os.environ.get('XYZEXCEL_OCR_MIN_CALLS', 3))
+OCR_HEALTH_ERROR_THRESHOLD = float(os.environ.get('XYZEXCEL_OCR_ERROR_THRESHOLD', 0.5))
+OCR_HEALTH_COOLDOWN = float(os.environ.get('XYZEXCEL_OCR_COOLDOWN', 30))
+ocr_providers = {
+    name: ProviderHealth(
+        name,
+        window=OCR_HEALTH_WINDOW,
+        min_calls=OCR_HEALTH_MIN_CALLS,
+        error_threshold=OCR_HEALTH_ERROR_THRESHOLD,
+        cooldown=OCR_HEALTH_COOLDOWN,
+        qps=float(os.environ.get(qps_env, default_qps))
+    )
+    for name, qps_env, default_qps in (
+        ('baidu', 'XYZEXCEL_OCR_BAIDU_QPS', 2),
+        ('ocr.space', 'XYZEXCEL_OCR_SPACE_QPS', 0),
+    )
+}
+
+# 百度返回这些错误码说明服务本身不可用（限额、令牌、内部错误），计入健康统计；
+# 其他错误码（如 216xxx 图片格式/大小错误）是请求本身的问题
+BAIDU_UNHEALTHY_ERROR_CODES = {1, 2, 4, 17, 18, 19, 110, 111, 282000}
+
+# 百度token有效期30天，缓存后复用，提前一小时刷新
+_baidu_token_cache = {'token': None, 'expires_at': 0}
+_baidu_token_lock = threading.Lock()
+BAIDU_TOKEN_REFRESH_MARGIN = 3600
+
+
+def _load_openpyxl():
+    """延迟导入openpyxl及图片相关模块，返回openpyxl模块"""
+    global openpyxl, get_column_letter, ExcelImage, OneCellAnchor, AnchorMarker, XDRPositiveSize2D, CellRange
+    if openpyxl is None:
+        from openpyxl.utils import get_column_letter as _get_column_letter
+        from openpyxl.worksheet.cell_range import CellRange as _CellRange
+        from openpyxl.drawing.image import Image as _ExcelImage
+        from openpyxl.drawing.spreadsheet_drawing import OneCellAnchor as _OneCellAnchor, AnchorMarker as _AnchorMarker
+        from openpyxl.drawing.xdr import XDRPositiveSize2D as _XDRPositiveSize2D
+        import openpyxl as _openpyxl
+
+        get_column_letter = _get_column_letter
+        ExcelImage = _ExcelImage
+        OneCellAnchor = _OneCellAnchor
+        AnchorMarker = _AnchorMarker
+        XDRPositiveSize2D = _XDRPositiveSize2D
+        CellRange = _CellRange
+        openpyxl = _openpyxl
+    return openpyxl
+
+
+def get_template_bytes(template=None):
+    """读取Excel模板内容（按修改时间缓存）"""
+    _load_openpyxl()
+    return template_registry.get(template).data
+
+
+def get_baidu_access_token(force_refresh=False):
+    """获取百度API访问令牌（带缓存）"""
     if not BAIDU_API_KEY or not BAIDU_SECRET_KEY:
         return None
 
-    url = f"https://aip.baidubce.com/oauth/2.0/token?grant_type=client_credentials&client_id={BAIDU_API_KEY}&client_secret={BAIDU_SECRET_KEY}"
+    with _baidu_token_lock:
+        if not force_refresh and _baidu_token_cache['token'] and time.time() < _baidu_token_cache['expires_at']:
+            return _baidu_token_cache['token']
+
+        url = f"{BAIDU_API_BASE}/oauth/2.0/token?grant_type=client_credentials&client_id={BAIDU_API_KEY}&client_secret={BAIDU_SECRET_KEY}"
+
+        try:
+            req = urllib.request.Request(url, method='POST')
+            with stage('baidu_token'), urllib.request.urlopen(req, timeout=10) as response:
+                result = json.loads(response.read().decode('utf-8'))
+        except Exception as e:
+            print(f"获取百度token失败: {e}")
+            return None
+
+        token = result.get('access_token')
+        if token:
+            expires_in = int(result.get('expires_in', 0) or 0)
+            _baidu_token_cache['token'] = token
+            _baidu_token_cache['expires_at'] = time.time() + max(expires_in - BAIDU_TOKEN_REFRESH_MARGIN, 0)
+        return token
 
-    try:
-        req = urllib.request.Request(url, method='POST')
-        with urllib.request.urlopen(req, timeout=10) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            return result.get('access_token')
-    except Exception as e:
-        print(f"获取百度token失败: {e}")
-        return None
 
+def invalidate_baidu_access_token():
+    """清除缓存的百度令牌（令牌失效时调用）"""
+    with _baidu_token_lock:
+        _baidu_token_cache['token'] = None
+        _baidu_token_cache['expires_at'] = 0
 
-def ocr_baidu(image_data):
-    """使用百度OCR识别图片"""
+
+def ocr_baidu(image_data, probe=False):
+    """使用百度OCR识别图片
+
+    Args:
+        probe: 是否为熔断器半开时放行的探测请求（ProviderHealth.allow() 的返回值）
+    """
+    health = ocr_providers['baidu']
+    start = time.perf_counter()
     access_token = get_baidu_access_token()
     if not access_token:
-        return None, "百度OCR未配置或获取token失败"
+        error = "百度OCR未配置或获取token失败"
+        health.record(False, time.perf_counter() - start, error, probe=probe)
+        return None, error
 
-    url = f"https://aip.baidubce.com/rest/2.0/ocr/v1/accurate?access_token={access_token}"
+    url = f"{BAIDU_API_BASE}/rest/2.0/ocr/v1/accurate?access_token={access_token}"
 
     try:
         # Base64编码
@@ -87,21 +224,35 @@ def ocr_baidu(image_data):
         req = urllib.request.Request(url, data=payload)
         req.add_header('Content-Type', 'application/x-www-form-urlencoded')
 
-        with urllib.request.urlopen(req, timeout=30) as response:
+        with stage('ocr_baidu'), urllib.request.urlopen(req, timeout=30) as response:
             result = json.loads(response.read().decode('utf-8'))
 
         if 'error_code' in result:
-            return None, f"百度OCR错误: {result.get('error_msg', '未知错误')}"
-
+            # 110: token无效, 111: token过期
+            if result.get('error_code') in (110, 111):
+                invalidate_baidu_access_token()
+            error = f"百度OCR错误: {result.get('error_msg', '未知错误')}"
+            health.record(result.get('error_code') not in BAIDU_UNHEALTHY_ERROR_CODES, time.perf_counter() - start, error, probe=probe)
+            return None, error
+
+        health.record(True, time.perf_counter() - start, probe=probe)
         # 返回完整结果列表
         return result.get('words_result', []), None
 
     except Exception as e:
-        return None, f"百度OCR请求失败: {str(e)}"
+        error = f"百度OCR请求失败: {str(e)}"
+        health.record(False, time.perf_counter() - start, error, probe=probe)
+        return None, error
+
 
+def ocr_space(image_data, filename='image.png', probe=False):
+    """使用OCR.space API识别图片中的文字（备用）
 
-def ocr_space(image_data, filename='image.png'):
-    """使用OCR.space API识别图片中的文字（备用）"""
+    Args:
+        probe: 是否为熔断器半开时放行的探测请求
+    """
+    health = ocr_providers['ocr.space']
+    start = time.perf_counter()
     try:
         # Base64编码图片
         if isinstance(image_data, bytes):
@@ -134,12 +285,15 @@ def ocr_space(image_data, filename='image.png'):
         req = urllib.request.Request(OCR_SPACE_API_URL, data=data)
         req.add_header('Content-Type', 'application/x-www-form-urlencoded')
 
-        with urllib.request.urlopen(req, timeout=30) as response:
+        with stage('ocr_space'), urllib.request.urlopen(req, timeout=30) as response:
             result = json.loads(response.read().decode('utf-8'))
 
         if result.get('IsErroredOnProcessing'):
-            return None, result.get('ErrorMessage', ['OCR处理失败'])[0]
+            error = result.get('ErrorMessage', ['OCR处理失败'])[0]
+            health.record(False, time.perf_counter() - start, error, probe=probe)
+            return None, error
 
+        health.record(True, time.perf_counter() - start, probe=probe)
         parsed_results = result.get('ParsedResults', [])
         if parsed_results:
             text = parsed_results[0].get('ParsedText', '')
@@ -148,23 +302,46 @@ def ocr_space(image_data, filename='image.png'):
         return None, '未能识别到文字'
 
     except Exception as e:
-        return None, f'OCR请求失败: {str(e)}'
+        error = f'OCR请求失败: {str(e)}'
+        health.record(False, time.perf_counter() - start, error, probe=probe)
+        return None, error
+
+
+_SKIP_MESSAGES = {'circuit_open': '服务暂时不可用（已熔断）', 'rate_limited': '请求过于频繁（已限流）'}
 
 
 def ocr_from_image(image_data, filename='image.png'):
-    """智能OCR识别 - 优先使用百度，失败则用OCR.space"""
+    """智能OCR识别 - 优先使用百度，失败则用OCR.space
+
+    熔断中或超出QPS配额的服务会被直接跳过，不等待超时。
+    """
     # 先尝试百度OCR（更准确）
     if BAIDU_API_KEY and BAIDU_SECRET_KEY:
-        text, error = ocr_baidu(image_data)
-        if text:
-            return text, None, 'baidu'
-        print(f"百度OCR失败: {error}，尝试备用方案...")
+        allowed, reason, probe = ocr_providers['baidu'].allow()
+        if allowed:
+            text, error = ocr_baidu(image_data, probe=probe)
+            if text:
+                metrics.OCR_REQUESTS.inc(provider='baidu', result='success')
+                return text, None, 'baidu'
+            metrics.OCR_REQUESTS.inc(provider='baidu', result='failure')
+            print(f"百度OCR失败: {error}，尝试备用方案...")
+        else:
+            metrics.OCR_REQUESTS.inc(provider='baidu', result=reason)
+            print(f"百度OCR{_SKIP_MESSAGES[reason]}，使用备用方案")
+        metrics.OCR_FALLBACKS.inc(from_provider='baidu')
 
     # 备用：OCR.space
-    text, error = ocr_space(image_data, filename)
+    allowed, reason, probe = ocr_providers['ocr.space'].allow()
+    if not allowed:
+        metrics.OCR_REQUESTS.inc(provider='ocr.space', result=reason)
+        return None, f"OCR{_SKIP_MESSAGES[reason]}，请稍后重试", None
+
+    text, error = ocr_space(image_data, filename, probe=probe)
     if text:
+        metrics.OCR_REQUESTS.inc(provider='ocr.space', result='success')
         return text, None, 'ocr.space'
 
+    metrics.OCR_REQUESTS.inc(provider='ocr.space', result='failure')
     return None, error or '所有OCR方案都失败了', None
 
 
@@ -176,6 +353,12 @@ def process_spatial_ocr(words_result):
     if not words_result:
         return ""
 
+    with stage('process_spatial_ocr'):
+        return _process_spatial_ocr(words_result)
+
+
+def _process_spatial_ocr(words_result):
+
     # 添加辅助属性：中心点Y坐标
     items = []
     for item in words_result:
@@ -248,6 +431,11 @@ def parse_ocr_text(data):
        no.12
     2. 单行格式：x=77.463 y=33.497 z=50.000 no.1
     """
+    with stage('parse_ocr_text'):
+        return _parse_ocr_text(data)
+
+
+def _parse_ocr_text(data):
     points = []
 
     # 处理输入数据
@@ -424,14 +612,13 @@ def generate_measurement_data(points, tolerance=0.03):
     """生成带随机偏差的测量数据"""
     measurements = []
 
-    for point in points:
-        for axis in ['X', 'Y', 'Z']:
-            nominal = point[axis.lower()]
+    for point_id, x, y, z in point_rows(points):
+        for axis, nominal in (('X', x), ('Y', y), ('Z', z)):
             deviation = random.uniform(-tolerance, tolerance)
             measured = nominal + deviation
 
             measurements.append({
-                'point': point['id'],
+                'point': point_id,
                 'axis': axis,
                 'tol_min': -tolerance,
                 'tol_max': tolerance,
@@ -459,6 +646,104 @@ def format_csv(measurements):
     return '\n'.join(lines)
 
 
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+def _profiling_requested():
+    """判断当前请求是否要求剖析（需在配置中开启并设置令牌，且令牌匹配）"""
+    token = app.config.get('PROFILING_TOKEN')
+    if not app.config.get('PROFILING_ENABLED') or not token:
+        return False
+    value = request.headers.get('X-Profile')
+    return bool(value) and hmac.compare_digest(value.encode(), token.encode())
+
+
+@app.before_request
+def _start_request_profile():
+    if not _profiling_requested():
+        return
+    mode = request.headers.get('X-Profile-Mode') or request.args.get('profile_mode') or 'sample'
+    if mode not in PROFILE_MODES:
+        return jsonify({'error': f'不支持的剖析模式: {mode}'}), 400
+    g.request_profile = RequestProfile(
+        app.config['PROFILING_DIR'],
+        request.endpoint,
+        request.content_length,
+        mode,
+        keep=app.config.get('PROFILING_MAX_FILES')
+    ).start()
+
+
+def _stop_request_profile():
+    profile = g.pop('request_profile', None)
+    if profile is None:
+        return None
+    try:
+        return profile.stop()
+    except Exception as e:
+        print(f"写出剖析结果失败: {e}")
+        return None
+
+
+@app.after_request
+def _finish_request_profile(response):
+    output_path = _stop_request_profile()
+    if output_path:
+        response.headers['X-Profile-Output'] = os.path.basename(output_path)
+    return response
+
+
+@app.teardown_request
+def _teardown_request_profile(exc):
+    # 请求异常时 after_request 不会执行，这里保证剖析器被停止
+    _stop_request_profile()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    """记录每个接口的耗时、状态码和请求/响应大小"""
+    start = getattr(g, 'request_start', None)
+    endpoint = request.endpoint or 'unknown'
+    if start is not None and endpoint != 'metrics_endpoint':
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        metrics.HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        if request.content_length is not None:
+            metrics.REQUEST_PAYLOAD_BYTES.set(request.content_length, endpoint=endpoint)
+        if response.content_length is not None:
+            metrics.RESPONSE_PAYLOAD_BYTES.set(response.content_length, endpoint=endpoint)
+    return response
+
+
+def _validated_json(validator):
+    """解析并按模式校验JSON请求体，返回 (数据, 错误响应)"""
+    with stage('request_decode'):
+        data = request.get_json(silent=True)
+    if data is None:
+        return None, (jsonify({'error': '请求体不是有效的JSON'}), 400)
+
+    try:
+        with stage('payload_validate'):
+            return validator.validate(data), None
+    except PayloadError as e:
+        return None, (jsonify({'error': f"请求数据无效: {e}"}), 400)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus格式的指标"""
+    for name, health in ocr_providers.items():
+        metrics.OCR_CIRCUIT_STATE.set(STATE_VALUES[health.snapshot()['state']], provider=name)
+    return Response(metrics.render_all(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/admin/ocr')
+def ocr_status():
+    """各OCR服务的健康状态、熔断器和限流情况"""
+    return jsonify({'providers': [health.snapshot() for health in ocr_providers.values()]})
+
+
 @app.route('/')
 def index():
     """主页"""
@@ -496,6 +781,8 @@ def upload_image():
         if isinstance(ocr_text, list):
             ocr_text_str = process_spatial_ocr(ocr_text)
 
+        metrics.POINTS_COUNT.set(len(points), endpoint='upload_image')
+
         return jsonify({
             'success': True,
             'ocr_text': ocr_text_str,
@@ -508,13 +795,52 @@ def upload_image():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/import_cmm', methods=['POST'])
+def import_cmm_file():
+    """导入三坐标测量机导出文件（PC-DMIS/Calypso/DMIS/XYZ），不经过OCR"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': '请选择导出文件'}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': '请选择导出文件'}), 400
+
+        tolerance = float(request.form.get('tolerance', 0.03))
+        fmt = request.form.get('format') or None
+
+        with stage('import_cmm'):
+            result = cmm_import.import_cmm_stream(file.stream, fmt, tolerance, parse_single_line)
+
+        points = result['points']
+        if not points:
+            return jsonify({'error': '未能从文件中解析出测量点，请检查格式'}), 400
+
+        metrics.POINTS_COUNT.set(len(points), endpoint='import_cmm_file')
+
+        return jsonify({
+            'success': True,
+            'format': result['format'],
+            'points': points,
+            'points_count': len(points),
+            'full_data': result['full_data']
+        })
+
+    except cmm_import.CMMImportError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/generate', methods=['POST'])
 def generate():
     """生成测量数据"""
     try:
-        data = request.get_json()
-        text = data.get('coordinates', '')
-        tolerance = float(data.get('tolerance', 0.03))
+        data, error_response = _validated_json(payload_schema.GENERATE)
+        if error_response:
+            return error_response
+        text = data['coordinates']
+        tolerance = data['tolerance']
 
         if not text.strip():
             return jsonify({'error': '请输入坐标数据'}), 400
@@ -546,9 +872,11 @@ def generate():
 def generate_from_points():
     """从已解析的点生成测量数据"""
     try:
-        data = request.get_json()
-        points = data.get('points', [])
-        tolerance = float(data.get('tolerance', 0.03))
+        data, error_response = _validated_json(payload_schema.GENERATE_FROM_POINTS)
+        if error_response:
+            return error_response
+        points = data['points']
+        tolerance = data['tolerance']
 
         if not points:
             return jsonify({'error': '没有坐标数据'}), 400
@@ -562,7 +890,7 @@ def generate_from_points():
         return jsonify({
             'success': True,
             'points_count': len(points),
-            'points': points,
+            'points': list(points),
             'csv': csv_content
         })
 
@@ -628,215 +956,232 @@ def copy_row(ws, source_row, target_row):
         copy_cell_format(source_cell, target_cell)
 
 
-def update_sheet_data(wb, sheet_name, points, tolerance=0.03, image_data=None, filename=None, full_data=None):
+def insert_sheet_image(ws, image_data, image_range=None, image_anchor='A7'):
+    """将base64图片缩放后居中插入到图片区域（模板版面中的合并区域，默认A7所在区域）"""
+    try:
+        # 去掉base64头 (data:image/png;base64,...)
+        if ',' in image_data:
+            image_data = image_data.split(',')[1]
+
+        img_bytes = base64.b64decode(image_data)
+        img_stream = io.BytesIO(img_bytes)
+        img = ExcelImage(img_stream)
+
+        merged_range = None
+        if image_range:
+            merged_range = CellRange(image_range)
+        else:
+            # 寻找 A7 所在的合并单元格
+            for rng in ws.merged_cells.ranges:
+                # 检查A7 (Col 1, Row 7) 是否在范围内
+                if (rng.min_col <= 1 <= rng.max_col) and (rng.min_row <= 7 <= rng.max_row):
+                    merged_range = rng
+                    break
+
+        if merged_range:
+            # 计算合并区域的总宽度和高度 (估算)
+            total_width_px = 0
+            for col_idx in range(merged_range.min_col, merged_range.max_col + 1):
+                col_letter = get_column_letter(col_idx)
+                col_w = ws.column_dimensions[col_letter].width
+                if col_w is None: col_w = 8.38 # 默认宽度
+                total_width_px += col_w * 7 # 粗略转换: 1 char width ≈ 7 pixels
+
+            total_height_px = 0
+            for row_idx in range(merged_range.min_row, merged_range.max_row + 1):
+                row_h = ws.row_dimensions[row_idx].height
+                if row_h is None: row_h = 15 # 默认高度
+                total_height_px += row_h * 1.33 # 1 point ≈ 1.33 pixels
+
+            # 调整图片大小以适应区域 (留出10%边距)
+            target_w = max(total_width_px * 0.9, 100) # 至少100px
+            target_h = max(total_height_px * 0.9, 100) # 至少100px
+
+            if img.width > target_w or img.height > target_h:
+                scale_w = target_w / img.width if img.width > 0 else 1
+                scale_h = target_h / img.height if img.height > 0 else 1
+                scale = min(scale_w, scale_h)
+
+                img.width = int(img.width * scale)
+                img.height = int(img.height * scale)
+
+            # 水平居中 (精确计算偏移量)
+            remaining_w = total_width_px - img.width
+            offset_x = max(0, remaining_w / 2)
+
+            # 垂直居中
+            remaining_h = total_height_px - img.height
+            offset_y = max(0, remaining_h / 2)
+
+            # 寻找包含偏移起点的列
+            current_x = 0
+            anchor_col = merged_range.min_col
+            col_offset_px = 0
+
+            for col_idx in range(merged_range.min_col, merged_range.max_col + 1):
+                col_letter = get_column_letter(col_idx)
+                col_w = ws.column_dimensions[col_letter].width
+                if col_w is None: col_w = 8.38
+                px_w = col_w * 7
+
+                if current_x + px_w > offset_x:
+                    anchor_col = col_idx
+                    col_offset_px = offset_x - current_x
+                    break
+
+                current_x += px_w
+
+            # 寻找包含偏移起点的行
+            current_y = 0
+            anchor_row = merged_range.min_row
+            row_offset_px = 0
+
+            for row_idx in range(merged_range.min_row, merged_range.max_row + 1):
+                row_h = ws.row_dimensions[row_idx].height
+                if row_h is None: row_h = 15
+                px_h = row_h * 1.33
+
+                if current_y + px_h > offset_y:
+                    anchor_row = row_idx
+                    row_offset_px = offset_y - current_y
+                    break
+
+                current_y += px_h
+
+            # 使用 OneCellAnchor 进行精确放置
+            # EMU (English Metric Unit) 转换: 1 pixel = 9525 EMUs
+            col_offset_emu = int(col_offset_px * 9525)
+            row_offset_emu = int(row_offset_px * 9525)
+
+            marker = AnchorMarker(col=anchor_col - 1, colOff=col_offset_emu, row=anchor_row - 1, rowOff=row_offset_emu)
+            size = XDRPositiveSize2D(cx=int(img.width * 9525), cy=int(img.height * 9525))
+            img.anchor = OneCellAnchor(_from=marker, ext=size)
+
+            ws.add_image(img)
+
+        else:
+            # 如果不是合并单元格，使用之前的简单逻辑
+            max_width = 300
+            max_height = 200
+            if img.width > max_width or img.height > max_height:
+                scaling = min(max_width / img.width, max_height / img.height)
+                img.width = int(img.width * scaling)
+                img.height = int(img.height * scaling)
+
+            ws.add_image(img, image_anchor)
+    except Exception as e:
+        print(f"插入图片失败: {e}")
+
+
+def build_measurement_data(points, tolerance=0.03, full_data=None):
+    """生成写入工作表的测量数据：有完整数据时直接使用，否则按公差生成随机偏差"""
+    measurement_data = []
+
+    if full_data and len(full_data) > 0:
+        # 使用用户提供的完整数据
+        for point, axis, nominal, measured in measurement_rows(full_data):
+            measurement_data.append({
+                'point': point,
+                'axis': axis,
+                'nominal': nominal,
+                'measured': measured
+            })
+    else:
+        # 生成随机偏差数据
+        for point, x, y, z in point_rows(points):
+            for axis, nominal in (('X', x), ('Y', y), ('Z', z)):
+                deviation = random.uniform(-tolerance, tolerance)
+                measured = nominal + deviation
+                measurement_data.append({
+                    'point': point,
+                    'axis': axis,
+                    'nominal': nominal,
+                    'measured': measured
+                })
+
+    return measurement_data
+
+
+def write_measurement(ws, layout, point, axis, nominal, measured):
+    """写入单个测量值（理论值、实测值及数字格式）"""
+    target_row = layout.axis_row(point, axis)
+
+    # 更新数值
+    ws.cell(target_row, layout.nominal_col, nominal)
+    ws.cell(target_row, layout.measured_col, measured)
+
+    # 设置标准数字格式
+    ws.cell(target_row, layout.nominal_col).number_format = "0.000"
+    ws.cell(target_row, layout.measured_col).number_format = "0.000"
+
+    # 强制设置偏差列(I列)格式，确保负数显示为 -0.000 而不是红色括号
+    ws.cell(target_row, layout.deviation_col).number_format = "0.000"
+
+
+def update_sheet_data(wb, sheet_name, points, tolerance=0.03, image_data=None, filename=None, full_data=None, layout=None,
+                      measurement_data=None):
     """更新单个工作表的数据
 
     Args:
         full_data: 可选的完整测量数据列表，每项包含 pointId, axis, nominal, measured, deviation
                    如果提供此参数，将直接使用这些数据而不生成随机偏差
+        layout: 模板注册表中缓存的版面描述（SheetLayout），未提供时现场分析工作表
+        measurement_data: 已生成的测量数据（build_measurement_data 的结果），提供时忽略 points/full_data
     """
     if sheet_name not in wb.sheetnames:
         return f"工作表 '{sheet_name}' 不存在于模板中"
 
+    _load_openpyxl()
     ws = wb[sheet_name]
 
     try:
-        # 更新 B3 单元格：编号 + 后缀
-        if filename:
+        if layout is None:
+            layout = analyze_sheet(ws)
+
+        # 更新产品件号单元格（B3）：编号 + 后缀
+        if filename and layout.part_no_cell:
             # 从文件名提取编号（第二个 - 之前的部分）
             # 例如 "P25-488-前门扶手本体上（左右）-三坐标报告" -> "P25-488"
             parts = filename.split('-')
             if len(parts) >= 2:
                 prefix = f"{parts[0]}-{parts[1]}"
-                # 根据工作表名确定后缀
-                if sheet_name == '前模仁':
-                    suffix = '-CAV1（A）'
-                else:  # 后模仁
-                    suffix = '-COR1（B）'
-                ws.cell(3, 2).value = prefix + suffix
+                # 后缀由工作表名确定：前模仁 -CAV1（A），后模仁 -COR1（B）
+                ws.cell(*layout.part_no_cell).value = prefix + layout.part_no_suffix
 
         # 生成或使用测量数据
-        measurement_data = []
-
-        if full_data and len(full_data) > 0:
-            # 使用用户提供的完整数据
-            for item in full_data:
-                measurement_data.append({
-                    'point': item.get('pointId', 1),
-                    'axis': item.get('axis', 'X').upper(),
-                    'nominal': float(item.get('nominal', 0)),
-                    'measured': float(item.get('measured', 0))
-                })
-        else:
-            # 生成随机偏差数据
-            for p in points:
-                for axis in ['X', 'Y', 'Z']:
-                    nominal = float(p[axis.lower()])
-                    deviation = random.uniform(-tolerance, tolerance)
-                    measured = nominal + deviation
-                    measurement_data.append({
-                        'point': p['id'],
-                        'axis': axis,
-                        'nominal': nominal,
-                        'measured': measured
-                    })
+        if measurement_data is None:
+            measurement_data = build_measurement_data(points, tolerance, full_data)
 
         # 计算需要的测量点数量
         max_point = max(item['point'] for item in measurement_data)
 
-        # 统计当前测量点数量
-        current_points = sum(1 for row in range(1, ws.max_row + 1)
-                             if ws.cell(row, 1).value and "测量点" in str(ws.cell(row, 1).value))
-
-        # 添加测量点
-        if max_point > current_points:
-            for new_point in range(current_points + 1, max_point + 1):
-                new_start_row = 13 + (new_point - 1) * 6
-                for offset in range(5):
-                    ws.insert_rows(new_start_row + offset)
-                    copy_row(ws, 19 + offset, new_start_row + offset)
-                ws.cell(new_start_row, 1).value = f"测量点{new_point}"
-
-        # 删除多余测量点
-        elif max_point < current_points:
-            for point_to_delete in range(current_points, max_point, -1):
-                start_row = 13 + (point_to_delete - 1) * 6
-                ws.delete_rows(start_row, 5)
+        # 模板中已有的测量点数量
+        current_points = layout.point_count
+
+        # 添加/删除测量点
+        with stage('insert_rows'):
+            # 添加测量点
+            if max_point > current_points:
+                for new_point in range(current_points + 1, max_point + 1):
+                    new_start_row = layout.block_row(new_point)
+                    for offset in range(layout.block_rows):
+                        ws.insert_rows(new_start_row + offset)
+                        copy_row(ws, layout.copy_source_row + offset, new_start_row + offset)
+                    ws.cell(new_start_row, layout.label_col).value = f"测量点{new_point}"
+
+            # 删除多余测量点
+            elif max_point < current_points:
+                for point_to_delete in range(current_points, max_point, -1):
+                    ws.delete_rows(layout.block_row(point_to_delete), layout.block_rows)
 
         # 更新测量数据
         for item in measurement_data:
-            point, axis = item['point'], item['axis']
-            nominal, measured = item['nominal'], item['measured']
-
-            axis_offset = {'X': 0, 'Y': 1, 'Z': 2}[axis]
-            target_row = 15 + (point - 1) * 6 + axis_offset
-
-            # 更新数值
-            ws.cell(target_row, 7, nominal)
-            ws.cell(target_row, 8, measured)
-
-            # 设置标准数字格式
-            ws.cell(target_row, 7).number_format = "0.000"
-            ws.cell(target_row, 8).number_format = "0.000"
-
-            # 强制设置偏差列(I列)格式，确保负数显示为 -0.000 而不是红色括号
-            ws.cell(target_row, 9).number_format = "0.000"
+            write_measurement(ws, layout, item['point'], item['axis'], item['nominal'], item['measured'])
 
         # 插入图片
         if image_data:
-            try:
-                # 去掉base64头 (data:image/png;base64,...)
-                if ',' in image_data:
-                    image_data = image_data.split(',')[1]
-
-                img_bytes = base64.b64decode(image_data)
-                img_stream = io.BytesIO(img_bytes)
-                img = ExcelImage(img_stream)
-
-                # 寻找 A7 所在的合并单元格
-                img_anchor = 'A7'
-                merged_range = None
-
-                # 遍历所有合并单元格范围
-                for rng in ws.merged_cells.ranges:
-                    # 检查A7 (Col 1, Row 7) 是否在范围内
-                    if (rng.min_col <= 1 <= rng.max_col) and (rng.min_row <= 7 <= rng.max_row):
-                        merged_range = rng
-                        break
-
-                if merged_range:
-                    # 计算合并区域的总宽度和高度 (估算)
-                    total_width_px = 0
-                    for col_idx in range(merged_range.min_col, merged_range.max_col + 1):
-                        col_letter = get_column_letter(col_idx)
-                        col_w = ws.column_dimensions[col_letter].width
-                        if col_w is None: col_w = 8.38 # 默认宽度
-                        total_width_px += col_w * 7 # 粗略转换: 1 char width ≈ 7 pixels
-
-                    total_height_px = 0
-                    for row_idx in range(merged_range.min_row, merged_range.max_row + 1):
-                        row_h = ws.row_dimensions[row_idx].height
-                        if row_h is None: row_h = 15 # 默认高度
-                        total_height_px += row_h * 1.33 # 1 point ≈ 1.33 pixels
-
-                    # 调整图片大小以适应区域 (留出10%边距)
-                    target_w = max(total_width_px * 0.9, 100) # 至少100px
-                    target_h = max(total_height_px * 0.9, 100) # 至少100px
-
-                    if img.width > target_w or img.height > target_h:
-                        scale_w = target_w / img.width if img.width > 0 else 1
-                        scale_h = target_h / img.height if img.height > 0 else 1
-                        scale = min(scale_w, scale_h)
-
-                        img.width = int(img.width * scale)
-                        img.height = int(img.height * scale)
-
-                    # 水平居中 (精确计算偏移量)
-                    remaining_w = total_width_px - img.width
-                    offset_x = max(0, remaining_w / 2)
-
-                    # 垂直居中
-                    remaining_h = total_height_px - img.height
-                    offset_y = max(0, remaining_h / 2)
-
-                    # 寻找包含偏移起点的列
-                    current_x = 0
-                    anchor_col = merged_range.min_col
-                    col_offset_px = 0
-
-                    for col_idx in range(merged_range.min_col, merged_range.max_col + 1):
-                        col_letter = get_column_letter(col_idx)
-                        col_w = ws.column_dimensions[col_letter].width
-                        if col_w is None: col_w = 8.38
-                        px_w = col_w * 7
-
-                        if current_x + px_w > offset_x:
-                            anchor_col = col_idx
-                            col_offset_px = offset_x - current_x
-                            break
-
-                        current_x += px_w
-
-                    # 寻找包含偏移起点的行
-                    current_y = 0
-                    anchor_row = merged_range.min_row
-                    row_offset_px = 0
-
-                    for row_idx in range(merged_range.min_row, merged_range.max_row + 1):
-                        row_h = ws.row_dimensions[row_idx].height
-                        if row_h is None: row_h = 15
-                        px_h = row_h * 1.33
-
-                        if current_y + px_h > offset_y:
-                            anchor_row = row_idx
-                            row_offset_px = offset_y - current_y
-                            break
-
-                        current_y += px_h
-
-                    # 使用 OneCellAnchor 进行精确放置
-                    # EMU (English Metric Unit) 转换: 1 pixel = 9525 EMUs
-                    col_offset_emu = int(col_offset_px * 9525)
-                    row_offset_emu = int(row_offset_px * 9525)
-
-                    marker = AnchorMarker(col=anchor_col - 1, colOff=col_offset_emu, row=anchor_row - 1, rowOff=row_offset_emu)
-                    size = XDRPositiveSize2D(cx=int(img.width * 9525), cy=int(img.height * 9525))
-                    img.anchor = OneCellAnchor(_from=marker, ext=size)
-
-                    ws.add_image(img)
-
-                else:
-                    # 如果不是合并单元格，使用之前的简单逻辑
-                    max_width = 300
-                    max_height = 200
-                    if img.width > max_width or img.height > max_height:
-                        scaling = min(max_width / img.width, max_height / img.height)
-                        img.width = int(img.width * scaling)
-                        img.height = int(img.height * scaling)
-
-                    ws.add_image(img, 'A7')
-            except Exception as e:
-                print(f"插入图片失败: {e}")
+            with stage('image_insert'):
+                insert_sheet_image(ws, image_data, layout.image_range, layout.image_anchor)
 
         return None
 
@@ -844,71 +1189,320 @@ def update_sheet_data(wb, sheet_name, points, tolerance=0.03, image_data=None, f
         return f"更新工作表 '{sheet_name}' 失败: {str(e)}"
 
 
-def generate_excel_from_template(points, sheet_name, tolerance=0.03, image_data=None, sheets_data=None, filename=None):
-    """从模板生成Excel文件 (支持单表或多表)"""
+def _normalize_sheets(points, sheet_name, tolerance, image_data, sheets_data):
+    """把单表/多表两种请求统一为工作表列表"""
+    if sheets_data:
+        return [{
+            'sheet_name': item['sheet_name'],
+            'points': item['points'],
+            'tolerance': item.get('tolerance', tolerance),
+            'image_data': item.get('image_data'),
+            'full_data': item.get('full_data')  # 获取完整数据（如果有）
+        } for item in sheets_data]
+
+    # 兼容旧的单表模式
+    return [{'sheet_name': sheet_name, 'points': points, 'tolerance': tolerance, 'image_data': image_data, 'full_data': None}]
+
+
+def _image_digest(image_data):
+    return hashlib.sha1(image_data.encode('utf-8')).hexdigest() if image_data else None
+
+
+def _fill_workbook(wb, layouts, sheets, filename):
+    """把各工作表数据写入工作簿，返回 (各表写入状态, 错误)"""
+    states = {}
+    for item in sheets:
+        measurement_data = build_measurement_data(item['points'], item['tolerance'], item['full_data'])
+        with stage('update_sheet_data'):
+            err = update_sheet_data(
+                wb,
+                item['sheet_name'],
+                item['points'],
+                item['tolerance'],
+                item['image_data'],
+                filename,
+                item['full_data'],
+                layouts.get(item['sheet_name']),
+                measurement_data
+            )
+        if err:
+            return None, err
+
+        states[item['sheet_name']] = {
+            'max_point': max(m['point'] for m in measurement_data),
+            'tolerance': item['tolerance'],
+            'image': _image_digest(item['image_data']),
+            'full_data': bool(item['full_data']),
+            'values': {(m['point'], m['axis']): (m['nominal'], m['measured']) for m in measurement_data},
+        }
+    return states, None
+
+
+def _save_workbook(wb):
+    """保存到内存"""
+    buffer = io.BytesIO()
+    with stage('workbook_save'):
+        wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def generate_excel_from_template(points, sheet_name, tolerance=0.03, image_data=None, sheets_data=None, filename=None, template=None):
+    """从模板生成Excel文件 (支持单表或多表)
+
+    Args:
+        template: 注册表中的模板名称，默认使用 model.xlsx
+    """
+    buffer, _, error = generate_report(points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+    return buffer, error
+
+
+def generate_report(points, sheet_name, tolerance=0.03, image_data=None, sheets_data=None, filename=None, template=None):
+    """同 generate_excel_from_template，另外返回各工作表状态：(buffer, 状态, 错误)
+
+    状态用于按报告ID缓存后增量修改（进程池中完整生成时带回主进程）。
+    """
     if not HAS_OPENPYXL:
-        return None, "openpyxl未安装，无法生成Excel"
+        return None, None, "openpyxl未安装，无法生成Excel"
 
-    if not os.path.exists(EXCEL_TEMPLATE_PATH):
-        return None, f"模板文件不存在: {EXCEL_TEMPLATE_PATH}"
+    _load_openpyxl()
+    try:
+        report_template = template_registry.get(template)
+    except TemplateError as e:
+        return None, None, str(e)
 
     try:
         # 加载模板
-        wb = openpyxl.load_workbook(EXCEL_TEMPLATE_PATH)
+        with stage('workbook_load'):
+            wb = report_template.load_workbook()
 
-        # 处理多表数据
-        if sheets_data:
-            for item in sheets_data:
-                full_data = item.get('full_data')  # 获取完整数据（如果有）
-                err = update_sheet_data(
-                    wb,
-                    item['sheet_name'],
-                    item['points'],
-                    item.get('tolerance', tolerance),
-                    item.get('image_data'),
-                    filename,
-                    full_data
-                )
-                if err:
-                    return None, err
-        else:
-            # 兼容旧的单表模式
-            err = update_sheet_data(wb, sheet_name, points, tolerance, image_data, filename)
-            if err:
-                return None, err
+        sheets = _normalize_sheets(points, sheet_name, tolerance, image_data, sheets_data)
+        states, err = _fill_workbook(wb, report_template.layouts, sheets, filename)
+        if err:
+            metrics.EXCEL_FAILURES.inc()
+            return None, None, err
 
-        # 保存到内存
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        buffer = _save_workbook(wb)
         wb.close()
 
-        return buffer, None
+        return buffer, states, None
 
     except Exception as e:
-        return None, f"生成Excel失败: {str(e)}"
+        metrics.EXCEL_FAILURES.inc()
+        return None, None, f"生成Excel失败: {str(e)}"
+
+
+def _diff_sheet(state, item):
+    """比较新请求与缓存状态，返回需要改写的 {(点, 轴): (理论值, 实测值)}；结构有变化时返回 None"""
+    if (item['tolerance'] != state['tolerance']
+            or _image_digest(item['image_data']) != state['image']
+            or bool(item['full_data']) != state['full_data']):
+        return None
+
+    old_values = state['values']
+    changes = {}
+    if item['full_data']:
+        new_values = {(m['point'], m['axis']): (m['nominal'], m['measured'])
+                      for m in build_measurement_data(None, full_data=item['full_data'])}
+        if new_values.keys() != old_values.keys():
+            return None
+        for key, value in new_values.items():
+            if old_values[key] != value:
+                changes[key] = value
+    else:
+        # 随机偏差模式：理论值未变的点保留上次的实测值，只有改动的点重新生成偏差
+        keys = set()
+        for point, x, y, z in point_rows(item['points']):
+            for axis, nominal in (('X', x), ('Y', y), ('Z', z)):
+                key = (point, axis)
+                keys.add(key)
+                old = old_values.get(key)
+                if old is None:
+                    return None
+                if old[0] != nominal:
+                    changes[key] = (nominal, nominal + random.uniform(-item['tolerance'], item['tolerance']))
+        if keys != old_values.keys():
+            return None
+    return changes
+
+
+def _snapshot_images(wb):
+    """记录工作簿中各图片的原始字节
+
+    openpyxl 保存时会读取并关闭图片的数据流，缓存的工作簿再次保存前需要用这些字节重建数据流。
+    """
+    images = []
+    for ws in wb.worksheets:
+        for img in ws._images:
+            ref = img.ref
+            if hasattr(ref, 'getvalue'):
+                images.append((img, ref.getvalue()))
+            elif isinstance(ref, str):
+                with open(ref, 'rb') as f:
+                    images.append((img, f.read()))
+    return images
+
+
+def _restore_images(images):
+    for img, data in images:
+        img.ref = io.BytesIO(data)
+
+
+def _plan_patch(entry, report_template, filename, sheets):
+    """判断能否在缓存的工作簿上增量修改，能则返回 {工作表名: 改动}，否则返回 None"""
+    if (entry.template_name != report_template.name
+            or entry.template_mtime != report_template.mtime
+            or entry.filename != filename
+            or [item['sheet_name'] for item in sheets] != list(entry.sheets)):
+        return None
+
+    plan = {}
+    for item in sheets:
+        changes = _diff_sheet(entry.sheets[item['sheet_name']], item)
+        if changes is None:
+            return None
+        plan[item['sheet_name']] = changes
+    return plan
+
+
+def generate_excel_incremental(report_id, points, sheet_name, tolerance=0.03, image_data=None, sheets_data=None, filename=None, template=None,
+                               pool=None):
+    """按报告ID生成Excel：与上次相比只有数值变化时，只改写变化的单元格再保存
+
+    行插入、图片嵌入等结构性工作只在首次生成（或结构变化）时进行。
+    提供 pool 时完整生成在进程池中进行，主进程只缓存生成的文件；在本进程中增量修改也占用进程池的名额，
+    已满时抛出 PoolBusy。
+
+    Returns:
+        (buffer, error, mode)，mode 为 'incremental'（增量）或 'full'（完整生成）
+    """
+    if not HAS_OPENPYXL:
+        return None, "openpyxl未安装，无法生成Excel", None
+
+    _load_openpyxl()
+    try:
+        report_template = template_registry.get(template)
+    except TemplateError as e:
+        return None, str(e), None
+
+    sheets = _normalize_sheets(points, sheet_name, tolerance, image_data, sheets_data)
+
+    entry = report_cache.get(report_id)
+    if entry is not None:
+        with entry.lock:
+            plan = _plan_patch(entry, report_template, filename, sheets)
+            if plan is not None:
+                with pool.admit() if pool is not None else nullcontext():
+                    try:
+                        if entry.wb is None:
+                            with stage('report_load'):
+                                wb = openpyxl.load_workbook(io.BytesIO(entry.data))
+                            entry.attach(wb, _snapshot_images(wb))
+                            report_cache.put(report_id, entry)
+                        with stage('report_patch'):
+                            for name, changes in plan.items():
+                                ws = entry.wb[name]
+                                layout = report_template.layouts[name]
+                                for (point, axis), (nominal, measured) in changes.items():
+                                    write_measurement(ws, layout, point, axis, nominal, measured)
+                                entry.sheets[name]['values'].update(changes)
+                        _restore_images(entry.images)
+                        buffer = _save_workbook(entry.wb)
+                        metrics.REPORT_GENERATIONS.inc(mode='incremental')
+                        return buffer, None, 'incremental'
+                    except Exception as e:
+                        # 缓存状态已不可信，丢弃后完整生成
+                        print(f"增量生成失败，改为完整生成: {e}")
+                        report_cache.discard(report_id)
+
+    if pool is not None:
+        buffer, states, error = pool.generate_report(points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+        if error:
+            return None, error, None
+        report_cache.put(report_id, ReportEntry(None, report_template.name, report_template.mtime, filename, states,
+                                                data=buffer.getvalue()))
+        metrics.REPORT_GENERATIONS.inc(mode='full')
+        return buffer, None, 'full'
+
+    try:
+        with stage('workbook_load'):
+            wb = report_template.load_workbook()
+
+        states, err = _fill_workbook(wb, report_template.layouts, sheets, filename)
+        if err:
+            metrics.EXCEL_FAILURES.inc()
+            return None, err, None
+
+        images = _snapshot_images(wb)
+        buffer = _save_workbook(wb)
+
+    except Exception as e:
+        metrics.EXCEL_FAILURES.inc()
+        return None, f"生成Excel失败: {str(e)}", None
+
+    report_cache.put(report_id, ReportEntry(wb, report_template.name, report_template.mtime, filename, states, images))
+    metrics.REPORT_GENERATIONS.inc(mode='full')
+    return buffer, None, 'full'
+
+
+_excel_pool = None
+_excel_pool_lock = threading.Lock()
+
+
+def get_excel_pool():
+    """返回Excel生成进程池，未配置进程数时返回 None"""
+    global _excel_pool
+    workers = app.config.get('EXCEL_WORKERS')
+    if not workers or not HAS_OPENPYXL:
+        return None
+    with _excel_pool_lock:
+        if _excel_pool is None:
+            _excel_pool = ExcelPool(
+                workers,
+                max_pending=app.config.get('EXCEL_MAX_PENDING') or None,
+                timeout=app.config.get('EXCEL_TIMEOUT', 120)
+            )
+        return _excel_pool
+
+
+def _sheet_point_count(item):
+    """工作表的测量点数：完整数据每个点有 X/Y/Z 三行，按不同的点号计数"""
+    if item.get('points'):
+        return len(item['points'])
+    full_data = item.get('full_data')
+    return len(set(full_data.point_ids)) if full_data else 0
 
 
 @app.route('/generate_excel', methods=['POST'])
 def generate_excel():
     """生成Excel文件并下载"""
     try:
-        data = request.get_json()
+        # 先校验请求体并把坐标转换为类型化数组，格式错误在生成工作簿之前返回
+        data, error_response = _validated_json(payload_schema.GENERATE_EXCEL)
+        if error_response:
+            return error_response
 
         # 检查是否为多表请求
         sheets_data = data.get('sheets_data')
 
         # 单表请求参数
-        points = data.get('points', [])
-        sheet_name = data.get('sheet_name', '前模仁')
+        points = data['points']
+        sheet_name = data['sheet_name']
         image_data = data.get('image_data')
 
-        filename = data.get('filename', '')
-        tolerance = float(data.get('tolerance', 0.03))
+        filename = data['filename']
+        tolerance = data['tolerance']
+        template = data.get('template')
+        report_id = data.get('report_id')
 
         if not sheets_data and not points:
             return jsonify({'error': '没有坐标数据'}), 400
 
+        if sheets_data:
+            metrics.POINTS_COUNT.set(sum(_sheet_point_count(item) for item in sheets_data), endpoint='generate_excel')
+        else:
+            metrics.POINTS_COUNT.set(len(points), endpoint='generate_excel')
+
         if not filename:
             filename = f"三坐标报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
@@ -917,25 +1511,159 @@ def generate_excel():
             filename += '.xlsx'
 
         # 生成Excel (传入原始文件名用于提取编号)
-        buffer, error = generate_excel_from_template(points, sheet_name, tolerance, image_data, sheets_data, filename)
+        # 带 report_id 时使用增量生成：只改动了部分坐标时不重建整个工作簿
+        # 配置了进程池时完整生成在进程池中进行，增量修改在本进程中进行，两者共用准入控制
+        mode = 'full'
+        pool = get_excel_pool()
+        try:
+            if report_id:
+                buffer, error, mode = generate_excel_incremental(str(report_id), points, sheet_name, tolerance, image_data, sheets_data,
+                                                                 filename, template, pool=pool)
+            elif pool is not None:
+                buffer, error = pool.generate(points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+            else:
+                buffer, error = generate_excel_from_template(points, sheet_name, tolerance, image_data, sheets_data, filename, template)
+        except (PoolBusy, WorkerCrashed) as e:
+            response = jsonify({'error': f"服务器繁忙，请稍后重试（{e}）"})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        except PoolTimeout as e:
+            return jsonify({'error': str(e)}), 504
 
         if error:
             return jsonify({'error': error}), 400
 
-        return send_file(
+        response = send_file(
             buffer,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             as_attachment=True,
             download_name=filename
         )
+        response.headers['X-Report-Generation'] = mode
+        return response
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-# 创建templates目录
-templates_dir = os.path.join(os.path.dirname(__file__), 'templates')
-os.makedirs(templates_dir, exist_ok=True)
+@app.route('/templates')
+def list_templates():
+    """列出已注册的Excel模板及其版面描述"""
+    if not HAS_OPENPYXL:
+        return jsonify({'error': 'openpyxl未安装，无法生成Excel'}), 500
+
+    _load_openpyxl()
+    templates = []
+    for name in template_registry.names():
+        try:
+            templates.append(template_registry.get(name).to_dict())
+        except TemplateError as e:
+            templates.append({'name': name, 'error': str(e)})
+    return jsonify({'default': template_registry.default, 'templates': templates})
+
+
+# ========== 预热与就绪检查 ==========
+
+# 预热用的示例数据，覆盖各解析分支
+_WARMUP_TEXT = """1, -77.463, 33.497, 50.000
+no.2 x=-77.463 y=33.497 z=50.000
+x=-77.463 y=33.497 z=50.000 no.3
+x=-77.463 y=33.497 z=50.000
+-77.463 33.497 50.000"""
+
+_WARMUP_WORDS = [
+    {'words': 'x=-201.865', 'location': {'top': 10, 'left': 10, 'height': 20}},
+    {'words': 'y=233.505', 'location': {'top': 12, 'left': 120, 'height': 20}},
+    {'words': 'z=108.338', 'location': {'top': 11, 'left': 230, 'height': 20}},
+    {'words': 'no.1', 'location': {'top': 40, 'left': 10, 'height': 20}},
+]
+
+_warmup_state = {'started': False, 'ready': False, 'error': None, 'duration': None}
+_warmup_lock = threading.Lock()
+
+
+def warm_up():
+    """预热：导入openpyxl、加载页面和Excel模板、获取OCR令牌、编译解析正则
+
+    在接收流量前调用（启动时或由 /ready 在后台触发），避免首个请求承担这些开销。
+    返回错误信息，成功时返回 None。
+    """
+    with _warmup_lock:
+        if _warmup_state['ready']:
+            return None
+        _warmup_state['started'] = True
+
+    start = time.perf_counter()
+    errors = []
+
+    # 页面模板
+    try:
+        app.jinja_env.get_template('index.html')
+    except Exception as e:
+        errors.append(f"页面模板加载失败: {e}")
+
+    # 解析器：执行一遍各种格式，编译并缓存所有正则
+    parse_coordinates_text(_WARMUP_TEXT)
+    parse_ocr_text(_WARMUP_WORDS)
+    parse_ocr_text("x=1.000\ny=2.000\nz=3.000\nno.1")
+    parse_ocr_text("no.1 x:1,000 y:2,000 z:3,000")
+
+    # Excel模板：分析所有已注册模板的版面，再完整生成一次，预热openpyxl的读写模块
+    if HAS_OPENPYXL:
+        _load_openpyxl()
+        for name in template_registry.names():
+            try:
+                template_registry.get(name)
+            except TemplateError as e:
+                errors.append(str(e))
+        if not errors:
+            _, err = generate_excel_from_template([{'id': 1, 'x': 0.0, 'y': 0.0, 'z': 0.0}], '前模仁')
+            if err:
+                errors.append(err)
+
+        # 进程池：启动工作进程并预加载模板
+        pool = get_excel_pool()
+        if pool is not None and not errors:
+            try:
+                pool.start()
+            except Exception as e:
+                errors.append(f"Excel进程池启动失败: {e}")
+
+    # OCR令牌（失败不影响就绪，请求时会回退到OCR.space）
+    if BAIDU_API_KEY and BAIDU_SECRET_KEY:
+        if not get_baidu_access_token():
+            print("预热: 百度token获取失败，将在请求时重试")
+
+    duration = time.perf_counter() - start
+    with _warmup_lock:
+        _warmup_state['error'] = '; '.join(errors) or None
+        _warmup_state['duration'] = duration
+        _warmup_state['ready'] = not errors
+        if errors:
+            # 允许下一次就绪检查重新预热
+            _warmup_state['started'] = False
+
+    print(f"预热完成，耗时 {duration * 1000:.0f}ms" + (f"，错误: {_warmup_state['error']}" if errors else ""))
+    return _warmup_state['error']
+
+
+@app.route('/ready')
+def ready():
+    """就绪检查：预热完成返回200，否则在后台启动预热并返回503"""
+    with _warmup_lock:
+        state = dict(_warmup_state)
+        start_warmup = not state['started'] and not state['ready']
+        if start_warmup:
+            _warmup_state['started'] = True
+
+    if start_warmup:
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+    if state['ready']:
+        return jsonify({'ready': True, 'warmup_seconds': round(state['duration'], 3)})
+
+    return jsonify({'ready': False, 'error': state['error']}), 503
+
 
 if __name__ == '__main__':
     print("=" * 60)
@@ -946,4 +1674,7 @@ if __name__ == '__main__':
     print("\n按 Ctrl+C 停止服务器")
     print("=" * 60)
 
+    # debug 模式下重载器会先启动一个只负责监视文件的父进程，只在实际处理请求的子进程中预热
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up()
     app.run(host='0.0.0.0', port=5000, debug=True)